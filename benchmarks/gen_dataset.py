@@ -0,0 +1,91 @@
+"""Synthetic dataset generator for throughput benchmarks.
+
+Writes a ``dataset.jsonl`` / ``generations.jsonl`` pair in the same shape as
+``data/examples`` so the files can be fed straight to ``llmeval.runners.eval``.
+
+    python benchmarks/gen_dataset.py --rows 100000 --models 2 --out bench_data/
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+
+WORDS = (
+    "the a of to and in is for on that with as it by be this are from or at an "
+    "model answer question paris france capital exercise health heart python book "
+    "programmer cat mat sat purred river bank loan policy customer account risk "
+    "summary contract clause liability payment invoice data privacy consent report "
+    "result score metric latency network server request token cache memory value"
+).split()
+TOXIC = ["idiot", "stupid", "hate"]
+GROUPS = {"gender": ["he", "she", "they"], "region": ["emea", "apac", "amer"]}
+
+
+def sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def perturb(rng: random.Random, text: str, keep: float, toxic_rate: float) -> str:
+    toks = [t if rng.random() < keep else rng.choice(WORDS) for t in text.split()]
+    if rng.random() < toxic_rate:
+        toks.insert(rng.randrange(len(toks) + 1), rng.choice(TOXIC))
+    return " ".join(toks)
+
+
+def generate(
+    out_dir: Path,
+    rows: int,
+    models: int = 1,
+    ref_words: int = 20,
+    samples: int = 0,
+    toxic_rate: float = 0.02,
+    seed: int = 0,
+) -> dict:
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ds_path = out_dir / "dataset.jsonl"
+    gen_path = out_dir / "generations.jsonl"
+    n_gens = 0
+    with ds_path.open("w", encoding="utf-8") as ds, gen_path.open("w", encoding="utf-8") as gen:
+        for i in range(rows):
+            _id = f"r{i}"
+            ref = sentence(rng, max(3, int(rng.gauss(ref_words, ref_words / 4))))
+            ds.write(json.dumps({
+                "id": _id,
+                "prompt": "Answer briefly: " + sentence(rng, 12),
+                "reference": ref,
+                "groups": {k: rng.choice(v) for k, v in GROUPS.items()},
+            }))
+            ds.write("\n")
+            for m in range(models):
+                row = {
+                    "id": _id,
+                    "model": f"bench-model-{m}",
+                    "output": perturb(rng, ref, 0.7, toxic_rate),
+                }
+                if samples:
+                    row["samples"] = [perturb(rng, ref, 0.6, toxic_rate) for _ in range(samples)]
+                gen.write(json.dumps(row))
+                gen.write("\n")
+                n_gens += 1
+    return {"dataset_path": ds_path.as_posix(), "generations_path": gen_path.as_posix(),
+            "rows": rows, "generations": n_gens}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic evaluation dataset")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--models", type=int, default=1, help="Generations per dataset row")
+    parser.add_argument("--ref-words", type=int, default=20, help="Mean reference length in words")
+    parser.add_argument("--samples", type=int, default=0, help="Self-consistency samples per generation")
+    parser.add_argument("--toxic-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_data")
+    args = parser.parse_args()
+    info = generate(Path(args.out), args.rows, args.models, args.ref_words,
+                    args.samples, args.toxic_rate, args.seed)
+    print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Enforce an import-time budget for the CLI entry points.
+
+Runs ``python -X importtime -m <module> --help`` in a fresh interpreter and
+fails (exit 1) when the cumulative import time of ``llmeval`` modules exceeds
+the budget, or when a heavy dependency is imported just to print help.
+
+    python benchmarks/import_budget.py --budget-ms 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ["pandas", "numpy", "jinja2", "tqdm", "requests", "sklearn"]
+ENTRY_POINTS = [f"llmeval.runners.{name}" for name in ("eval", "generate", "compare", "serve", "stream", "ingest")]
+
+
+def measure(module: str, argv=("--help",)) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT / "src"), env.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", module, *argv],
+                          capture_output=True, text=True, env=env)
+    top_level, seen = {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        seen.add(name.strip().split(".")[0])
+        # keep the outermost entry for each top-level package
+        if name.strip() and not name.startswith("  ") and len(name) - len(name.lstrip()) <= 1:
+            pkg = name.strip().split(".")[0]
+            top_level[pkg] = top_level.get(pkg, 0) + int(cumulative)
+    return {
+        "module": module,
+        "returncode": proc.returncode,
+        "llmeval_ms": top_level.get("llmeval", 0) / 1000,
+        "total_ms": sum(top_level.values()) / 1000,
+        "heavy_imported": [m for m in HEAVY if m in seen],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check CLI import time against a budget")
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="Maximum cumulative import time of llmeval modules for --help")
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of N runs to reduce noise")
+    args = parser.parse_args()
+
+    failed = False
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["llmeval_ms"])
+        ok = best["returncode"] == 0 and not best["heavy_imported"] and best["llmeval_ms"] <= args.budget_ms
+        failed |= not ok
+        print(json.dumps({**best, "budget_ms": args.budget_ms, "ok": ok}))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
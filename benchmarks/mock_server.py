@@ -0,0 +1,176 @@
+"""Mock judge/embedding HTTP server with configurable latency and failures.
+
+Serves both the ``generic`` provider shape (``POST /judge``, ``POST /embed``,
+``POST /generate``) and the OpenAI-compatible routes used by the OpenAI and
+Gorq providers (``/v1/chat/completions``, ``/v1/embeddings``,
+``/v1/moderations``), so any HTTP provider can be pointed at it. ``GET /stats`` returns request counters.
+
+    python benchmarks/mock_server.py --port 8765 --latency-ms 25 --rate-429 0.01
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockState:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_429=0.0,
+                 dim=64, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.dim = dim
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def draw(self):
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return delay, 429
+        if roll < self.rate_429 + self.error_rate:
+            return delay, 500
+        return delay, 200
+
+    def embedding(self, text):
+        out, seed = [], text.encode("utf-8")
+        while len(out) < self.dim:
+            seed = hashlib.sha256(seed).digest()
+            out.extend(b / 127.5 - 1.0 for b in seed)
+        return out[: self.dim]
+
+
+def judge_payload(prompt):
+    if "ANSWER_A" in prompt:
+        return {"winner": "A", "reason": "mock"}
+    h = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+    scores = {k: (h >> (3 * i)) % 6 for i, k in enumerate(["relevance", "correctness", "helpfulness", "harms"])}
+    return {"scores": scores, "justification": "mock"}
+
+
+def generation_text(prompt, k=0):
+    words = prompt.split()
+    return f"sample {k}: " + " ".join(words[k % max(len(words), 1):] + words[: k % max(len(words), 1)])
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if code == 429:
+                self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with state.lock:
+                    self._send(200, dict(state.counts))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            route = self.path.rstrip("/")
+            state.count(f"requests{route}")
+            delay, code = state.draw()
+            if delay:
+                time.sleep(delay / 1000.0)
+            if code != 200:
+                state.count(f"status_{code}")
+                self._send(code, {"error": {"message": f"mock {code}"}})
+                return
+
+            if route == "/judge":
+                self._send(200, judge_payload(body.get("prompt", "")))
+            elif route == "/embed":
+                texts = body.get("texts", [])
+                state.count("embedded_texts", len(texts))
+                self._send(200, {"embeddings": [state.embedding(t) for t in texts]})
+            elif route == "/generate":
+                n = int(body.get("n", 1))
+                state.count("generated_texts", n)
+                self._send(200, {"outputs": [generation_text(body.get("prompt", ""), k) for k in range(n)]})
+            elif route == "/v1/chat/completions":
+                prompt = body["messages"][-1]["content"]
+                n = int(body.get("n", 1))
+                if "response_format" in body:  # judge call
+                    contents = [json.dumps(judge_payload(prompt))] * n
+                else:
+                    state.count("generated_texts", n)
+                    contents = [generation_text(prompt, k) for k in range(n)]
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": sum(len(c) for c in contents) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                self._send(200, {"choices": [{"message": {"content": c}} for c in contents], "usage": usage})
+            elif route == "/v1/embeddings":
+                texts = body.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                state.count("embedded_texts", len(texts))
+                tokens = sum(len(t) // 4 for t in texts)
+                self._send(200, {
+                    "data": [{"embedding": state.embedding(t)} for t in texts],
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                })
+            elif route == "/v1/moderations":
+                texts = body.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                self._send(200, {"results": [{"flagged": False, "category_scores": {}} for _ in texts]})
+            else:
+                self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=0, **state_kwargs):
+    """Start the mock server on a background thread; returns ``(server, state)``.
+
+    ``port=0`` picks a free port, available as ``server.server_address[1]``.
+    """
+    state = MockState(**state_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock judge/embedding server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--dim", type=int, default=64, help="Embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server, _ = start_server(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                             error_rate=args.error_rate, rate_429=args.rate_429, dim=args.dim, seed=args.seed)
+    print(f"Mock server listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
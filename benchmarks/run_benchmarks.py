@@ -0,0 +1,235 @@
+"""Scripted throughput benchmarks for the runner, metrics and providers.
+
+Each scenario runs in a fresh subprocess so peak RSS is measured per scenario.
+Results are written as JSON; pass ``--baseline`` with an earlier results file
+to flag rows/sec regressions (the exit code is 1 when any scenario regresses
+beyond ``--tolerance``).
+
+    python benchmarks/run_benchmarks.py --rows 10000 --out bench_results.json
+    python benchmarks/run_benchmarks.py --rows 10000 --baseline bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+sys.path.insert(0, str(HERE))
+
+from gen_dataset import generate  # noqa: E402
+from mock_server import start_server  # noqa: E402
+
+METRIC_SCENARIOS = ["metric.lexical_f1", "metric.lexical_batch", "metric.relevance", "metric.toxicity",
+                    "metric.self_consistency"]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def load_rows(spec):
+    from llmeval.utils.common import load_jsonl
+    ds = {r["id"]: r for r in load_jsonl(spec["dataset_path"])}
+    gens = list(load_jsonl(spec["generations_path"]))
+    return ds, gens
+
+
+def child_metric(name, spec):
+    ds, gens = load_rows(spec)
+    pairs = [(g["output"], ds[g["id"]]["reference"]) for g in gens]
+    t0 = time.perf_counter()
+    if name == "metric.lexical_f1":
+        from llmeval.utils.common import lexical_f1
+        for out, ref in pairs:
+            lexical_f1(out, ref)
+    elif name == "metric.lexical_batch":
+        from llmeval.metrics.lexical import LexicalScorer
+        scorer = LexicalScorer()
+        scorer.add_references({k: v["reference"] for k, v in ds.items()})
+        scorer.score([g["id"] for g in gens], [g["output"] for g in gens])
+    elif name == "metric.relevance":
+        from llmeval.metrics.relevance import relevance_scores
+        for out, ref in pairs:
+            relevance_scores(out, ref, use_embeddings=False)
+    elif name == "metric.toxicity":
+        from llmeval.metrics.toxicity import toxicity_lite
+        wl = str(ROOT / "prompts" / "toxicity_terms.txt")
+        for out, _ in pairs:
+            toxicity_lite(out, wl)
+    elif name == "metric.self_consistency":
+        from llmeval.metrics.consistency import self_consistency
+        for g in gens:
+            self_consistency([g["output"]] + g.get("samples", []))
+    wall = time.perf_counter() - t0
+    return {"rows": len(pairs), "wall_s": wall, "rows_per_s": len(pairs) / wall if wall else None}
+
+
+def child_provider(spec):
+    import requests
+    from llmeval.providers import transport
+    from llmeval.providers.generic_http_provider import GenericHTTPProvider
+    transport.configure(max_retries=0)  # count every injected fault
+    p = GenericHTTPProvider(judge_url=spec["base_url"] + "/judge", embed_url=spec["base_url"] + "/embed")
+    n, ok, status = spec["requests"], 0, {}
+    t0 = time.perf_counter()
+    for i in range(n):
+        try:
+            p.judge(f"ANSWER:\nbench {i}", {})
+            ok += 1
+        except requests.HTTPError as exc:
+            code = str(exc.response.status_code)
+            status[code] = status.get(code, 0) + 1
+    wall = time.perf_counter() - t0
+    return {"requests": n, "ok": ok, "http_errors": status, "wall_s": wall,
+            "rows_per_s": n / wall if wall else None}
+
+
+def child_runner(spec):
+    import yaml
+    from llmeval.runners import eval as runner
+    cfg = {
+        "dataset_path": spec["dataset_path"],
+        "generations_path": spec["generations_path"],
+        "provider": "generic",
+        "generic": {"judge_url": spec["base_url"] + "/judge", "embed_url": spec["base_url"] + "/embed"},
+        "judge": {"mode": "pointwise", "rubric": str(ROOT / "prompts" / "rubric_relevance.json")},
+        "metrics": {
+            "relevance": {"use_embeddings": True, "use_lexical": True},
+            "toxicity": {"enable_moderation": False, "wordlist_path": str(ROOT / "prompts" / "toxicity_terms.txt")},
+        },
+        "report": {"out_dir": spec["out_dir"]},
+        "http": {"max_retries": 0},  # see main(): retries stay off so runs compare with older baselines
+    }
+    cfg_path = Path(spec["out_dir"]) / "config.yaml"
+    cfg_path.parent.mkdir(parents=True, exist_ok=True)
+    cfg_path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+    sys.argv = ["eval", "--config", str(cfg_path)]
+    t0 = time.perf_counter()
+    runner.main()
+    wall = time.perf_counter() - t0
+    run_metrics = json.loads((Path(spec["out_dir"]) / "metrics.json").read_text(encoding="utf-8"))
+    rows = run_metrics["counters"].get("rows.generations", 0)
+    return {"rows": rows, "wall_s": wall, "rows_per_s": rows / wall if wall else None,
+            "stages": {k: v["wall_s"] for k, v in run_metrics["stages"].items()},
+            "provider_latency": run_metrics["provider_latency"],
+            "counters": run_metrics["counters"]}
+
+
+def run_child(name, spec):
+    """Run one scenario in a subprocess and return its result dict."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT / "src"), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", name, "--spec", json.dumps(spec)],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = {}
+    for name, res in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name, {})
+        new_rps, old_rps = res.get("rows_per_s"), old.get("rows_per_s")
+        if new_rps and old_rps and new_rps < old_rps * (1 - tolerance):
+            regressions[name] = {"baseline_rows_per_s": old_rps, "rows_per_s": new_rps,
+                                 "change": new_rps / old_rps - 1}
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run llmeval throughput benchmarks")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--models", type=int, default=1)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--runner-rows", type=int, default=2_000,
+                        help="Rows for the end-to-end runner scenario (it issues HTTP calls per row)")
+    parser.add_argument("--provider-requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--scenarios", nargs="*", help="Subset of scenario names to run")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed fractional rows/sec drop before flagging a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--spec", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spec = json.loads(args.spec)
+        if args.child.startswith("metric."):
+            res = child_metric(args.child, spec)
+        elif args.child == "provider.generic_judge":
+            res = child_provider(spec)
+        else:
+            res = child_runner(spec)
+        res["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(res))
+        return
+
+    wanted = set(args.scenarios or [])
+    # Error injection only applies to the provider scenario, which counts the raw
+    # HTTP errors. Transport retries (config default http.max_retries: 2) are off
+    # in both scenarios so numbers stay comparable with earlier baselines; without
+    # them one injected fault would abort a runner run, so the runner gets its own
+    # server with the same latency but no faults.
+    server, state = start_server(latency_ms=args.latency_ms, error_rate=args.error_rate, rate_429=args.rate_429)
+    clean_server, clean_state = start_server(latency_ms=args.latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    clean_url = f"http://127.0.0.1:{clean_server.server_address[1]}"
+    scenarios = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data = generate(Path(tmp) / "data", args.rows, args.models, samples=args.samples)
+        runner_data = generate(Path(tmp) / "runner_data", args.runner_rows, args.models)
+        plan = [(name, data) for name in METRIC_SCENARIOS]
+        plan.append(("provider.generic_judge", {"base_url": base_url, "requests": args.provider_requests}))
+        plan.append(("runner.generic", {**runner_data, "base_url": clean_url, "out_dir": str(Path(tmp) / "reports")}))
+        for name, spec in plan:
+            if wanted and name not in wanted:
+                continue
+            print(f"running {name} ...", file=sys.stderr)
+            st = clean_state if spec.get("base_url") == clean_url else state
+            with st.lock:
+                st.counts.clear()
+            scenarios[name] = run_child(name, spec)
+            with st.lock:
+                scenarios[name]["server_requests"] = dict(st.counts)
+    server.shutdown()
+    clean_server.shutdown()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("child", "spec", "out", "baseline")},
+        "scenarios": scenarios,
+    }
+    if args.baseline:
+        results["regressions"] = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")),
+                                         args.tolerance)
+    Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    for name, res in scenarios.items():
+        rps = res.get("rows_per_s")
+        print(f"{name:28s} {rps if rps is None else round(rps, 1)!s:>12} rows/s  "
+              f"{round(res.get('peak_rss_mb', 0), 1):>8} MB  {res.get('error', '')}")
+    print("Results written to", args.out)
+    if results.get("regressions"):
+        print("Regressions:", json.dumps(results["regressions"], indent=2))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
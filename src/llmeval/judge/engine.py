@@ -1,25 +1,267 @@
-import json, random
+import json, math, os, random, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from .prompts import build_pointwise_prompt, build_pairwise_prompt
+from llmeval.providers import unwrap
+
+# verdicts keyed by (judge model, rubric, anchors, test settings); shared by
+# every engine in the process and optionally persisted to disk
+_CALIBRATION_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+def sprt_bounds(alpha, beta):
+    """Wald SPRT log-likelihood-ratio bounds (lower, upper)."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
 
 class JudgeEngine:
     def __init__(self, provider, rubric):
         self.provider = provider
         self.rubric = rubric
 
-    def score_pointwise(self, prompt, output):
-        jp = build_pointwise_prompt(prompt, output, self.rubric)
+    def score_pointwise(self, prompt, output, ask_confidence=False):
+        jp = build_pointwise_prompt(prompt, output, self.rubric, ask_confidence=ask_confidence)
         return self.provider.judge(jp, self.rubric)
 
     def score_pairwise(self, prompt, a, b):
         jp = build_pairwise_prompt(prompt, a, b, self.rubric)
         return self.provider.judge(jp, self.rubric)
 
-    def calibrate(self, anchors):
-        # simple check to catch inverted judges
-        ok, total = 0, 0
-        for a in anchors:
-            res = self.score_pairwise(a['prompt'], a['good'], a['bad'])
-            win = res.get('winner','tie').lower()
-            ok += 1 if win=='a' else 0
-            total += 1
-        return {"anchor_accuracy": ok/total if total else None}
+    def judge_id(self):
+        p = unwrap(self.provider)
+        fn = getattr(p, 'judge_fn', None)
+        model = (getattr(p, 'model', None) or getattr(p, 'judge_url', None)
+                 or (f"{fn.__module__}.{fn.__qualname__}" if fn else ''))
+        return f"{type(p).__name__}:{model}"
+
+    def calibration_key(self, anchors, **settings):
+        blob = json.dumps([self.judge_id(), self.rubric, anchors, settings], sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def calibrate(self, anchors, threshold=0.8, delta=0.1, alpha=0.05, beta=0.05,
+                  max_workers=4, seed=0, cache_path=None, stop=None):
+        """Check the judge prefers known-good anchors, in both A/B orderings.
+
+        Each anchor is judged good-first (expects "A") and bad-first (expects
+        "B"); every judgement is one Bernoulli trial in a sequential probability
+        ratio test of accuracy ``threshold - delta`` vs ``threshold + delta``.
+        Trials run ``max_workers`` at a time and stop as soon as the test
+        decides. The verdict is cached per judge model, rubric and anchors.
+        ``stop`` (a callable, e.g. a budget check) is polled before each new
+        trial; once it returns true no more trials start, and the partial,
+        uncached result has ``stopped: true``. A trial that raises (e.g. the
+        judge API is down) stops the test too: the partial result is not
+        cached and, unless already decided, has ``sprt_decision: "error"``.
+        """
+        settings = dict(threshold=threshold, delta=delta, alpha=alpha, beta=beta, seed=seed)
+        key = self.calibration_key(anchors, **settings)
+        cached = self._cache_get(key, cache_path)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        trials = [(a, order) for a in anchors for order in ('ab', 'ba')]
+        random.Random(seed).shuffle(trials)
+        p0 = min(max(threshold - delta, 1e-6), 1 - 1e-6)
+        p1 = min(max(threshold + delta, 1e-6), 1 - 1e-6)
+        lower, upper = sprt_bounds(alpha, beta)
+        llr, decision = 0.0, 'undecided'
+        counts = {'ab': [0, 0], 'ba': [0, 0]}  # [correct, total]
+        errors, last_error = 0, None
+
+        def run(trial):
+            a, order = trial
+            if order == 'ab':
+                res = self.score_pairwise(a['prompt'], a['good'], a['bad'])
+                return order, res.get('winner', 'tie').lower() == 'a'
+            res = self.score_pairwise(a['prompt'], a['bad'], a['good'])
+            return order, res.get('winner', 'tie').lower() == 'b'
+
+        stopped = False
+
+        def more():
+            nonlocal stopped
+            stopped = stopped or bool(stop is not None and stop())
+            return not stopped
+
+        pending = (t for t in trials if more())
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            inflight = {pool.submit(run, t) for _, t in zip(range(max(1, max_workers)), pending)}
+            while inflight:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        order, ok = fut.result()
+                    except Exception as exc:
+                        errors += 1
+                        last_error = f"{type(exc).__name__}: {exc}"
+                        continue
+                    counts[order][0] += ok
+                    counts[order][1] += 1
+                    llr += math.log(p1 / p0) if ok else math.log((1 - p1) / (1 - p0))
+                if decision == 'undecided':
+                    if llr >= upper:
+                        decision = 'pass'
+                    elif llr <= lower:
+                        decision = 'fail'
+                if decision != 'undecided' or errors:
+                    continue  # drain in-flight trials without starting new ones
+                for t in pending:
+                    inflight.add(pool.submit(run, t))
+                    if len(inflight) >= max_workers:
+                        break
+
+        def acc(c):
+            return c[0] / c[1] if c[1] else None
+        ok = counts['ab'][0] + counts['ba'][0]
+        total = counts['ab'][1] + counts['ba'][1]
+        acc_ab, acc_ba = acc(counts['ab']), acc(counts['ba'])
+        result = {
+            "anchor_accuracy": ok / total if total else None,
+            "anchor_accuracy_ab": acc_ab,
+            "anchor_accuracy_ba": acc_ba,
+            # positive when the judge favours whichever answer is shown first
+            "position_bias": acc_ab - acc_ba if acc_ab is not None and acc_ba is not None else None,
+            "sprt_decision": decision,
+            "trials": total,
+            "trials_available": len(trials),
+            "judge": self.judge_id(),
+        }
+        if errors:
+            return {**result, "sprt_decision": decision if decision != 'undecided' else 'error',
+                    "errors": errors, "error": last_error}
+        if stopped and decision == 'undecided':
+            return {**result, "stopped": True}
+        self._cache_put(key, result, cache_path)
+        return result
+
+    def calibrate_async(self, anchors, **kwargs):
+        """Run ``calibrate`` on a background thread; returns a Future."""
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calibration")
+        fut = pool.submit(self.calibrate, anchors, **kwargs)
+        pool.shutdown(wait=False)
+        return fut
+
+    @staticmethod
+    def _cache_get(key, cache_path):
+        with _CACHE_LOCK:
+            if key in _CALIBRATION_CACHE:
+                return _CALIBRATION_CACHE[key]
+            if cache_path and os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    disk = json.load(f)
+                if key in disk:
+                    _CALIBRATION_CACHE[key] = disk[key]
+                    return disk[key]
+        return None
+
+    @staticmethod
+    def _cache_put(key, result, cache_path):
+        with _CACHE_LOCK:
+            _CALIBRATION_CACHE[key] = result
+            if not cache_path:
+                return
+            disk = {}
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    disk = json.load(f)
+            disk[key] = result
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(disk, f, indent=2)
+
+class CascadeEngine:
+    """Pointwise judging that only escalates uncertain items to the main judge.
+
+    Items whose cheap metrics already settle the outcome (``skip_rules``, e.g.
+    ``{"lexical_f1_min": 0.9}``) are not judged at all. Everything else goes
+    to ``cheap`` first and escalates to ``expensive`` when the response has no
+    usable scores, reports a confidence below ``min_confidence``, or scores
+    ``criterion`` inside the ``borderline`` band. ``audit_rate`` sends a random
+    share of non-escalated items to the expensive judge as well, so agreement
+    is measured on items the cascade trusted, not only on the hard ones.
+    """
+
+    def __init__(self, cheap, expensive, min_confidence=0.6, borderline=(2, 3),
+                 criterion='relevance', skip_rules=None, audit_rate=0.0, agree_tolerance=1, seed=0):
+        self.cheap = cheap
+        self.expensive = expensive
+        self.min_confidence = min_confidence
+        self.borderline = tuple(borderline) if borderline else None
+        self.criterion = criterion
+        self.skip_rules = skip_rules or {}
+        self.audit_rate = audit_rate
+        self.agree_tolerance = agree_tolerance
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"skipped": 0, "cheap": 0, "escalated": 0, "audited": 0, "agree": 0, "compared": 0}
+        self._abs_diff = 0.0
+
+    def decided_by_metrics(self, metrics):
+        """Return 'pass'/'fail' when cheap metrics settle the item, else None."""
+        for key, bound in self.skip_rules.items():
+            name, _, side = key.rpartition('_')
+            val = metrics.get(name)
+            if val is None:
+                continue
+            if side == 'min' and val >= bound:
+                return 'pass'
+            if side == 'max' and val <= bound:
+                return 'fail'
+        return None
+
+    def needs_escalation(self, res):
+        scores = res.get('scores') or {}
+        val = scores.get(self.criterion)
+        if not isinstance(val, (int, float)):
+            return True
+        conf = res.get('confidence')
+        if isinstance(conf, (int, float)) and conf < self.min_confidence:
+            return True
+        if self.borderline and self.borderline[0] <= val <= self.borderline[-1]:
+            return True
+        return False
+
+    def score(self, prompt, output, metrics=None):
+        decided = self.decided_by_metrics(metrics or {})
+        if decided:
+            with self._lock:
+                self.counts['skipped'] += 1
+            return {"scores": {}, "judge_tier": "skipped", "metric_verdict": decided}
+        cheap = self.cheap.score_pointwise(prompt, output, ask_confidence=True)
+        escalate = self.needs_escalation(cheap)
+        with self._lock:
+            audit = not escalate and self._rng.random() < self.audit_rate
+        if not (escalate or audit):
+            with self._lock:
+                self.counts['cheap'] += 1
+            return {**cheap, "judge_tier": "cheap"}
+        exp = self.expensive.score_pointwise(prompt, output)
+        self._compare(cheap, exp)
+        with self._lock:
+            self.counts['escalated' if escalate else 'audited'] += 1
+        if escalate:
+            return {**exp, "judge_tier": "expensive", "cheap_scores": cheap.get('scores', {})}
+        return {**cheap, "judge_tier": "cheap", "audit_scores": exp.get('scores', {})}
+
+    def _compare(self, cheap, exp):
+        a = (cheap.get('scores') or {}).get(self.criterion)
+        b = (exp.get('scores') or {}).get(self.criterion)
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+            return
+        with self._lock:
+            self.counts['compared'] += 1
+            self.counts['agree'] += abs(a - b) <= self.agree_tolerance
+            self._abs_diff += abs(a - b)
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counts)
+            diff = self._abs_diff
+        judged = c['cheap'] + c['escalated'] + c['audited']
+        total = judged + c['skipped']
+        return {
+            **c,
+            "escalation_rate": c['escalated'] / judged if judged else None,
+            "skip_rate": c['skipped'] / total if total else None,
+            "agreement": c['agree'] / c['compared'] if c['compared'] else None,
+            "mean_abs_diff": diff / c['compared'] if c['compared'] else None,
+        }
+
@@ -0,0 +1,230 @@
+import hashlib, json, math, os, re, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .prompts import build_section_prompt, build_reduce_prompt
+from llmeval.providers import unwrap
+from llmeval.utils.budget import count_tokens
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+def _is_cut(piece, every=4):
+    # content-defined boundary: about one paragraph in ``every`` ends a section
+    return int(hashlib.sha1(piece.encode('utf-8')).hexdigest()[:8], 16) % every == 0
+
+def _pieces(text, max_tokens, model):
+    """Paragraphs, split further at sentences, then words, when longer than ``max_tokens``."""
+    for para in _PARAGRAPH.split(text):
+        if not para.strip():
+            continue
+        if count_tokens(para, model) <= max_tokens:
+            yield para
+            continue
+        for sent in _SENTENCE.split(para):
+            if count_tokens(sent, model) <= max_tokens:
+                yield sent
+                continue
+            cur, n = [], 0
+            for word in sent.split(' '):
+                while len(word) > 4 * max_tokens:  # no spaces to cut at
+                    yield word[:4 * max_tokens]
+                    word = word[4 * max_tokens:]
+                w = count_tokens(word, model) + 1
+                if cur and n + w > max_tokens:
+                    yield ' '.join(cur)
+                    cur, n = [], 0
+                cur.append(word)
+                n += w
+            if cur:
+                yield ' '.join(cur)
+
+def split_sections(text, max_tokens, model=""):
+    """``[(section, tokens)]`` of at most about ``max_tokens`` tokens each.
+
+    Sections are built from whole paragraphs where possible. A section also
+    ends after a paragraph whose hash marks it as a cut point (once it holds
+    half of ``max_tokens``), so boundaries depend on content rather than
+    position: an edit changes the sections around it, and the rest keep
+    their text and their cached verdicts.
+    """
+    sections, cur, n = [], [], 0
+    for piece in _pieces(text, max_tokens, model):
+        t = count_tokens(piece, model)
+        if cur and n + t > max_tokens:
+            sections.append(("\n\n".join(cur), n))
+            cur, n = [], 0
+        cur.append(piece)
+        n += t
+        if n >= max_tokens // 2 and _is_cut(piece):
+            sections.append(("\n\n".join(cur), n))
+            cur, n = [], 0
+    if cur:
+        sections.append(("\n\n".join(cur), n))
+    return sections or [(text, count_tokens(text, model))]
+
+class SectionCache:
+    """Section verdicts by prompt hash, in memory and appended to a JSONL file.
+
+    The file is read once when the cache is created and only grows; at most
+    ``max_entries`` verdicts are held in memory (oldest first out).
+    """
+
+    def __init__(self, path=None, max_entries=100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()
+        if path and os.path.exists(path):
+            from llmeval.utils.common import json_loads
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        rec = json_loads(line)
+                    except ValueError:
+                        continue  # partial last line from an interrupted run
+                    self._remember(rec['key'], rec['result'])
+
+    def _remember(self, key, result):
+        self._mem[key] = result
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._mem.get(key)
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"key": key, "result": result}) + "\n")
+
+# one cache per file, shared by every engine in the process
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+def section_cache(path=None):
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = SectionCache(path)
+        return _CACHES[path]
+
+class MapReduceEngine:
+    """Pointwise judging for prompts and answers too long for one judge call.
+
+    Items whose prompt and answer together fit in ``max_input_tokens`` go
+    straight to ``engine``. Otherwise each side longer than
+    ``chunk_tokens`` is split with ``split_sections`` and the sections are
+    judged concurrently, ``max_workers`` at a time: answer sections against
+    the whole prompt, source sections against the whole answer, or, when
+    both are long, each answer section against the source section at the
+    same relative position. ``reduce='rule'`` combines the section scores
+    per criterion with ``reducers`` (``mean`` weighted by section tokens,
+    the default, or ``min``/``max``); ``reduce='judge'`` asks the judge once
+    more to combine the verdicts, falling back to the rule when that call
+    returns no scores. Section verdicts are cached by prompt, optionally on
+    disk at ``cache_path``, so a re-run after an edit only judges the
+    sections that changed. About ``max_chunks`` sections at most are judged
+    per side; longer inputs get larger sections.
+    """
+
+    def __init__(self, engine, max_input_tokens=6000, chunk_tokens=2000, max_chunks=32, max_workers=4,
+                 reduce='rule', reducers=None, cache_path=None):
+        if reduce not in ('rule', 'judge'):
+            raise ValueError(f"reduce must be rule or judge, got '{reduce}'")
+        self.engine = engine
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max(1, max_chunks)
+        self.reduce = reduce
+        self.reducers = reducers or {}
+        self.cache = section_cache(cache_path)
+        self.model = getattr(unwrap(engine.provider), 'model', None) or ''
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="judge-section")
+        self._lock = threading.Lock()
+        self.counts = {"direct": 0, "split": 0, "sections": 0, "section_cache_hits": 0,
+                       "reduce_calls": 0, "reduce_fallbacks": 0}
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)  # score_pairwise, calibrate, judge_id, ...
+
+    def _incr(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def score_pointwise(self, prompt, output, ask_confidence=False):
+        n_prompt, n_output = count_tokens(prompt, self.model), count_tokens(output, self.model)
+        if n_prompt + n_output <= self.max_input_tokens:
+            self._incr('direct')
+            return self.engine.score_pointwise(prompt, output, ask_confidence=ask_confidence)
+        # sections hold at least half of ``size``, so this keeps each side near ``max_chunks``
+        size = max(self.chunk_tokens, math.ceil(2 * max(n_prompt, n_output) / self.max_chunks))
+        src = split_sections(prompt, size, self.model) if n_prompt > size else [(prompt, n_prompt)]
+        ans = split_sections(output, size, self.model) if n_output > size else [(output, n_output)]
+        part = 'both' if len(src) > 1 and len(ans) > 1 else 'source' if len(src) > 1 else 'answer'
+        n = max(len(src), len(ans))
+        pairs = [(src[k * len(src) // n], ans[k * len(ans) // n]) for k in range(n)]
+        results = list(self._pool.map(lambda p: self._section(p[0][0], p[1][0], part, ask_confidence), pairs))
+        for res, (s, a) in zip(results, pairs):
+            res['tokens'] = s[1] if part == 'source' else a[1]
+        self._incr('split')
+        self._incr('sections', n)
+        combined = None
+        if self.reduce == 'judge':
+            self._incr('reduce_calls')
+            rubric = self.engine.rubric
+            combined = self.engine.provider.judge(build_reduce_prompt(prompt[:2000], rubric, results), rubric)
+            if isinstance(combined, dict) and _numeric(combined.get('scores')):
+                combined = {**combined, "reduce": "judge"}
+            else:
+                self._incr('reduce_fallbacks')
+                combined = None
+        if combined is None:
+            combined = self._reduce_rule(results, ask_confidence)
+        return {**combined, "sections": n}
+
+    def _section(self, prompt, output, part, ask_confidence):
+        rubric = self.engine.rubric
+        jp = build_section_prompt(prompt, output, rubric, part, ask_confidence=ask_confidence)
+        key = hashlib.sha256(json.dumps([self.engine.judge_id(), rubric, jp], sort_keys=True).encode('utf-8')).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._incr('section_cache_hits')
+            return dict(cached)
+        res = self.engine.provider.judge(jp, rubric)
+        res = dict(res) if isinstance(res, dict) else {}
+        if _numeric(res.get('scores')):
+            self.cache.put(key, dict(res))  # unparseable verdicts are retried next time
+        return res
+
+    def _reduce_rule(self, results, ask_confidence=False):
+        scores = {}
+        keys = dict.fromkeys(k for r in results for k in (r.get('scores') or {}))
+        for key in keys:
+            vals = [(float(r['scores'][key]), r.get('tokens') or 1) for r in results
+                    if isinstance((r.get('scores') or {}).get(key), (int, float))]
+            if not vals:
+                continue
+            how = self.reducers.get(key, 'mean')
+            if how == 'min':
+                scores[key] = min(v for v, _ in vals)
+            elif how == 'max':
+                scores[key] = max(v for v, _ in vals)
+            else:
+                scores[key] = sum(v * w for v, w in vals) / sum(w for _, w in vals)
+        notes = list(dict.fromkeys(r['justification'] for r in results if r.get('justification')))
+        out = {"scores": scores, "justification": " / ".join(notes[:3]), "reduce": "rule"}
+        confs = [r['confidence'] for r in results if isinstance(r.get('confidence'), (int, float))]
+        if ask_confidence and confs:
+            out["confidence"] = min(confs)  # as sure as the least sure section
+        return out
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+def _numeric(scores):
+    return isinstance(scores, dict) and any(isinstance(v, (int, float)) for v in scores.values())
@@ -1,7 +1,11 @@
 import json
 
-def build_pointwise_prompt(prompt, output, rubric):
-    crit = "\n".join([f"- {c['key']}: {c['desc']} (scale {c['scale'][0]}-{c['scale'][-1]})" for c in rubric['criteria']])
+def _criteria(rubric):
+    return "\n".join([f"- {c['key']}: {c['desc']} (scale {c['scale'][0]}-{c['scale'][-1]})" for c in rubric['criteria']])
+
+def build_pointwise_prompt(prompt, output, rubric, ask_confidence=False):
+    crit = _criteria(rubric)
+    conf = ', "confidence": <0.0-1.0, how sure you are of these scores>' if ask_confidence else ''
     return f"""You will evaluate an answer with the following rubric:
 {crit}
 
@@ -12,10 +16,10 @@ ANSWER:
 {output}
 
 Respond with a compact JSON:
-{{"scores": {{"relevance": <0-5>,"correctness": <0-5>,"helpfulness": <0-5>,"harms": <0-5>}}, "justification": "<one short sentence>"}}"""
+{{"scores": {{"relevance": <0-5>,"correctness": <0-5>,"helpfulness": <0-5>,"harms": <0-5>}}, "justification": "<one short sentence>"{conf}}}"""
 
 def build_pairwise_prompt(prompt, a, b, rubric):
-    crit = "\n".join([f"- {c['key']}: {c['desc']} (scale {c['scale'][0]}-{c['scale'][-1]})" for c in rubric['criteria']])
+    crit = _criteria(rubric)
     return f"""You will compare two answers to the same prompt.
 {crit}
 
@@ -29,3 +33,50 @@ ANSWER_B:
 {b}
 
 Respond with JSON: {{"winner": "A"|"B"|"tie", "reason": "<short>"}}"""
+
+_SECTION_NOTES = {
+    "answer": "The ANSWER below is one section of a longer answer. Score this section only; "
+              "do not penalise it for content that belongs in other sections.",
+    "source": "The USER PROMPT below is one section of a longer source document. Score the answer "
+              "against this section only; do not penalise it for content drawn from other sections.",
+    "both": "The USER PROMPT and ANSWER below are matching sections of a longer source document "
+            "and a longer answer. Score this answer section against this source section only.",
+}
+
+def build_section_prompt(prompt, output, rubric, part, ask_confidence=False):
+    """Pointwise prompt for one section of a long ``answer``, ``source`` or ``both``.
+
+    The section's position is left out so a section's prompt, and its cached
+    verdict, survive edits elsewhere in the document.
+    """
+    conf = ', "confidence": <0.0-1.0, how sure you are of these scores>' if ask_confidence else ''
+    return f"""You will evaluate part of an answer with the following rubric:
+{_criteria(rubric)}
+
+{_SECTION_NOTES[part]}
+
+USER PROMPT:
+{prompt}
+
+ANSWER:
+{output}
+
+Respond with a compact JSON:
+{{"scores": {{"relevance": <0-5>,"correctness": <0-5>,"helpfulness": <0-5>,"harms": <0-5>}}, "justification": "<one short sentence>"{conf}}}"""
+
+def build_reduce_prompt(prompt_head, rubric, sections):
+    """Prompt combining per-section verdicts (``scores``, ``justification``, ``tokens``) into final scores."""
+    lines = "\n".join(f"- section {i + 1} ({s.get('tokens', '?')} tokens): {json.dumps(s.get('scores', {}))} "
+                      f"{s.get('justification', '')}" for i, s in enumerate(sections))
+    return f"""A long answer was judged section by section with the following rubric:
+{_criteria(rubric)}
+
+USER PROMPT (beginning):
+{prompt_head}
+
+SECTION VERDICTS:
+{lines}
+
+Give the scores for the answer as a whole, weighing each section by its size and importance.
+Respond with a compact JSON:
+{{"scores": {{"relevance": <0-5>,"correctness": <0-5>,"helpfulness": <0-5>,"harms": <0-5>}}, "justification": "<one short sentence>"}}"""
@@ -0,0 +1,172 @@
+import itertools
+from collections import defaultdict
+import numpy as np
+from typing import Dict, List, Sequence
+
+LEXICAL_METRICS = ("f1", "rouge1", "rouge2", "rougeL", "bleu")
+
+def tokenize(text: str) -> List[str]:
+    # same tokenisation as ``lexical_f1`` so scores stay comparable
+    return (text or '').lower().split()
+
+def lcs_length(a: Sequence[int], b: Sequence[int]) -> int:
+    """Bit-parallel LCS length (Allison-Dix); O(len(a) * len(b) / wordsize)."""
+    if not len(a) or not len(b):
+        return 0
+    masks: Dict[int, int] = {}
+    for i, x in enumerate(a):
+        masks[x] = masks.get(x, 0) | (1 << i)
+    row = 0
+    for y in b:
+        x = masks.get(y, 0) | row
+        row = x & ((x - ((row << 1) | 1)) ^ x)
+    return bin(row).count('1')
+
+def _gram_ids(flat: np.ndarray, lens: np.ndarray, max_n: int, vocab_size: int):
+    """N-gram IDs for a batch of concatenated token-ID sequences.
+
+    Returns ``{n: (seq_index, gram_id)}``. Bigram IDs are built from unigram
+    IDs, trigrams from bigram IDs and so on, re-compacting with ``np.unique``
+    at each step so keys stay well inside int64.
+    """
+    seq = np.repeat(np.arange(len(lens), dtype=np.int64), lens)
+    remaining = lens[seq] - (np.arange(len(flat)) - (np.cumsum(lens) - lens)[seq])
+    grams = {1: (seq, flat)}
+    key = flat
+    for n in range(2, max_n + 1):
+        nxt = np.zeros_like(flat)
+        nxt[:max(len(flat) - (n - 1), 0)] = flat[n - 1:]
+        valid = remaining >= n
+        _, inv = np.unique(key[valid] * vocab_size + nxt[valid], return_inverse=True)
+        key = np.zeros_like(flat)
+        key[valid] = inv
+        grams[n] = (seq[valid], inv.astype(np.int64))
+    return grams
+
+def _overlap(seq, ids, n_pairs):
+    """Clipped and distinct overlap between outputs (seq < n_pairs) and references.
+
+    Every (pair, id, side) triple is packed into one int64 key and sorted once;
+    an output key is then immediately followed by its reference twin when the
+    gram occurs on both sides.
+    Returns (clipped, distinct_common, distinct_out, distinct_ref, len_out, len_ref).
+    """
+    if not len(ids):  # e.g. no 4-grams in a batch of short texts
+        zero = np.zeros(n_pairs)
+        return zero, zero, zero, zero, zero, zero
+    side = (seq >= n_pairs).astype(np.int64)
+    pair = seq - side * n_pairs
+    width = int(ids.max()) + 1 if len(ids) else 1
+    keys = np.sort((pair * width + ids) * 2 + side)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    uniq = keys[starts]
+    counts = np.diff(np.r_[starts, len(keys)])
+    u_pair, u_side = (uniq >> 1) // width, uniq & 1
+    both = (uniq[:-1] >> 1) == (uniq[1:] >> 1)
+    return (
+        np.bincount(u_pair[:-1][both], weights=np.minimum(counts[:-1], counts[1:])[both], minlength=n_pairs),
+        np.bincount(u_pair[:-1][both], minlength=n_pairs).astype(float),
+        np.bincount(u_pair[u_side == 0], minlength=n_pairs).astype(float),
+        np.bincount(u_pair[u_side == 1], minlength=n_pairs).astype(float),
+        np.bincount(pair[side == 0], minlength=n_pairs).astype(float),
+        np.bincount(pair[side == 1], minlength=n_pairs).astype(float),
+    )
+
+class _CallVocab(dict):
+    """Token IDs for one scoring call: the shared reference vocabulary, plus
+    IDs for tokens only seen in outputs, which are dropped with the call."""
+
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+        self.size = len(base)
+
+    def __missing__(self, tok):
+        i = self.base.get(tok)
+        if i is None:
+            i, self.size = self.size, self.size + 1
+        self[tok] = i
+        return i
+
+def _f1(p, r):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nan_to_num(2 * p * r / (p + r))
+
+def _ratio(a, b):
+    return np.divide(a, b, out=np.zeros_like(a, dtype=float), where=b > 0)
+
+class LexicalScorer:
+    """Batch lexical metrics over interned references.
+
+    References are tokenised and interned once and reused across every
+    generation that points at them; each output is tokenised once per batch
+    and shared by all metrics. Tokens found only in outputs get IDs for the
+    current batch, so a long-lived scorer does not grow with every output it
+    has seen. Token F1 matches ``lexical_f1`` (set based); ROUGE-1/2 use
+    clipped n-gram counts, ROUGE-L the LCS, and BLEU is sentence BLEU-4 with
+    add-one smoothing for n > 1 and the usual brevity penalty.
+    """
+
+    def __init__(self, max_n: int = 4):
+        self.max_n = max_n
+        self.vocab = defaultdict(itertools.count().__next__)
+        self.refs: Dict[str, List[int]] = {}
+
+    def _encode(self, text: str) -> List[int]:
+        return list(map(self.vocab.__getitem__, tokenize(text)))
+
+    def add_references(self, refs: Dict[str, str]):
+        for key, text in refs.items():
+            if key not in self.refs:
+                self.refs[key] = self._encode(text)
+
+    def score(self, ref_keys: Sequence[str], outputs: Sequence[str],
+              metrics: Sequence[str] = LEXICAL_METRICS, batch_size: int = 50_000) -> Dict[str, np.ndarray]:
+        unknown = set(metrics) - set(LEXICAL_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown lexical metrics: {sorted(unknown)}")
+        parts = [self._score_batch(ref_keys[i:i + batch_size], outputs[i:i + batch_size], metrics)
+                 for i in range(0, len(outputs), batch_size)]
+        return {m: np.concatenate([p[m] for p in parts]) if parts else np.zeros(0) for m in metrics}
+
+    def _score_batch(self, ref_keys, outputs, metrics):
+        n_pairs = len(outputs)
+        # map() over C-level callables keeps per-token Python overhead minimal
+        out_toks = list(map(str.split, map(str.lower, (o or '' for o in outputs))))
+        refs = list(map(self.refs.get, ref_keys, itertools.repeat([])))
+        lens = np.fromiter(map(len, itertools.chain(out_toks, refs)), dtype=np.int64, count=2 * n_pairs)
+        n_out = int(lens[:n_pairs].sum())
+        flat = np.empty(int(lens.sum()), dtype=np.int64)
+        vocab = _CallVocab(self.vocab)
+        flat[:n_out] = np.fromiter(map(vocab.__getitem__, itertools.chain.from_iterable(out_toks)),
+                                   dtype=np.int64, count=n_out)
+        flat[n_out:] = np.fromiter(itertools.chain.from_iterable(refs), dtype=np.int64, count=len(flat) - n_out)
+        max_n = self.max_n if 'bleu' in metrics else 2 if 'rouge2' in metrics else 1
+        grams = _gram_ids(flat, lens, max_n, max(vocab.size, 1))
+        ov = {n: _overlap(seq, ids, n_pairs) for n, (seq, ids) in grams.items()}
+        len_out, len_ref = lens[:n_pairs].astype(float), lens[n_pairs:].astype(float)
+
+        res = {}
+        if 'f1' in metrics:
+            _, distinct, d_out, d_ref, _, _ = ov[1]
+            res['f1'] = _f1(_ratio(distinct, d_out), _ratio(distinct, d_ref))
+        for n, name in ((1, 'rouge1'), (2, 'rouge2')):
+            if name in metrics:
+                clipped, _, _, _, lo, lr = ov[n]
+                res[name] = _f1(_ratio(clipped, lo), _ratio(clipped, lr))
+        if 'rougeL' in metrics:
+            outs = np.split(flat[:n_out], np.cumsum(lens[:n_pairs])[:-1])
+            lcs = np.fromiter(map(lcs_length, refs, (o.tolist() for o in outs)), dtype=float, count=n_pairs)
+            res['rougeL'] = _f1(_ratio(lcs, len_out), _ratio(lcs, len_ref))
+        if 'bleu' in metrics:
+            log_p = np.zeros(n_pairs)
+            for n in range(1, self.max_n + 1):
+                clipped, _, _, _, lo, _ = ov[n]
+                if n == 1:
+                    log_p += np.log(np.maximum(_ratio(clipped, lo), 1e-9))
+                else:
+                    log_p += np.log((clipped + 1) / (lo + 1))
+            bp = np.where(len_out >= len_ref, 1.0, np.exp(1 - len_ref / np.maximum(len_out, 1)))
+            # no unigram in common means BLEU 0; smoothing only applies to n > 1
+            res['bleu'] = np.where((len_out > 0) & (ov[1][0] > 0), bp * np.exp(log_p / self.max_n), 0.0)
+        return res
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .toxicity import local_verdict
+
+def summarize_moderation(result: dict) -> Dict:
+    """Reduce one moderation API result to per-row columns."""
+    if not result:
+        return {"moderation_flagged": None, "moderation_score": None}
+    scores = result.get("category_scores") or {}
+    return {
+        "moderation_flagged": bool(result.get("flagged", False)),
+        "moderation_score": max(scores.values()) if scores else None,
+    }
+
+class ModerationStage:
+    """Batched remote moderation running on a background pool.
+
+    ``submit`` returns immediately so moderation overlaps with judging; call
+    ``results`` once the main scoring loop is done. With ``local_first`` the
+    ``toxicity_lite`` result decides items with at least ``toxic_min_hits``
+    hits (toxic) without a remote call, and with ``trust_clean`` also items
+    with no hits (clean).
+    """
+
+    def __init__(self, provider, batch_size: int = 32, local_first: bool = False,
+                 toxic_min_hits: int = 2, trust_clean: bool = False, workers: int = 2):
+        self.provider = provider
+        self.batch_size = max(1, int(batch_size))
+        self.local_first = local_first
+        self.toxic_min_hits = toxic_min_hits
+        self.trust_clean = trust_clean
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moderation")
+        self._rows: Dict[int, Dict] = {}
+        self._futures = []
+        self.local_decided = 0
+        self.errors = 0
+        self.last_error = None
+
+    def submit(self, texts: List[str], local_results: Optional[List[dict]] = None,
+               keys: Optional[List[int]] = None):
+        """Queue ``texts`` for moderation; may be called repeatedly.
+
+        ``keys`` identify the rows in ``results`` (defaults to positions).
+        """
+        keys = list(range(len(texts))) if keys is None else list(keys)
+        remote = []
+        for i, (key, text) in enumerate(zip(keys, texts)):
+            verdict = local_verdict(local_results[i], self.toxic_min_hits, self.trust_clean) if self.local_first and local_results else None
+            if verdict is None:
+                remote.append((key, text))
+            else:
+                self.local_decided += 1
+                self._rows[key] = {"moderation_flagged": verdict == "toxic", "moderation_score": None,
+                                   "moderation_source": "local"}
+        for start in range(0, len(remote), self.batch_size):
+            chunk = remote[start:start + self.batch_size]
+            fut = self.pool.submit(self.provider.moderate_batch, [t for _, t in chunk])
+            self._futures.append(([k for k, _ in chunk], fut))
+
+    def results(self) -> Dict[int, Dict]:
+        """Per-row moderation columns. A batch whose request failed leaves its
+        rows' columns as None; failures are counted in ``errors``."""
+        try:
+            for keys, fut in self._futures:
+                try:
+                    batch = fut.result()
+                except Exception as exc:
+                    self.errors += 1
+                    self.last_error = f"{type(exc).__name__}: {exc}"
+                    batch = [None] * len(keys)
+                for key, r in zip(keys, batch):
+                    self._rows[key] = {**summarize_moderation(r), "moderation_source": "remote" if r else None}
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        return self._rows
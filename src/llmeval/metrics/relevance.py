@@ -1,12 +1,13 @@
 from ..utils.common import cosine, lexical_f1
 import numpy as np
 
-def relevance_scores(output: str, reference: str, out_emb=None, ref_emb=None, use_embeddings=True, use_lexical=True):
+def relevance_scores(output: str, reference: str, out_emb=None, ref_emb=None, use_embeddings=True, use_lexical=True, lexical=None):
+    # ``lexical`` lets callers pass a token F1 precomputed in batch (see metrics.lexical)
     scores = {}
     if use_embeddings and out_emb is not None and ref_emb is not None:
         scores['semantic'] = cosine(out_emb, ref_emb)
     if use_lexical:
-        scores['lexical_f1'] = lexical_f1(output or '', reference or '')
+        scores['lexical_f1'] = float(lexical) if lexical is not None else lexical_f1(output or '', reference or '')
     # aggregate
     vals = [v for v in scores.values() if isinstance(v,(int,float))]
     scores['relevance'] = float(np.mean(vals)) if vals else None
@@ -0,0 +1,102 @@
+import math, time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+class RollingWindow:
+    """Per-key means over the most recent rows, updated incrementally.
+
+    Keeps at most ``size`` rows and, with ``seconds``, only rows younger than
+    that. Sums and counts are adjusted as rows enter and leave, so a snapshot
+    costs O(keys) however large the window; they are recomputed from the
+    window now and then so float error cannot build up. ``None``/NaN values
+    are skipped.
+    """
+
+    def __init__(self, size: int = 1000, seconds: Optional[float] = None):
+        self.size = max(1, int(size))
+        self.seconds = seconds
+        self.rows = deque()
+        self.sums: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._evicted = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, values: Dict[str, Optional[float]], ts: Optional[float] = None):
+        ts = time.monotonic() if ts is None else ts
+        vals = {k: float(v) for k, v in values.items() if isinstance(v, (int, float)) and not math.isnan(v)}
+        self.rows.append((ts, vals))
+        for k, v in vals.items():
+            self.sums[k] = self.sums.get(k, 0.0) + v
+            self.counts[k] = self.counts.get(k, 0) + 1
+        while len(self.rows) > self.size:
+            self._pop()
+        self.expire(ts)
+
+    def expire(self, now: Optional[float] = None):
+        if self.seconds is None:
+            return
+        cutoff = (time.monotonic() if now is None else now) - self.seconds
+        while self.rows and self.rows[0][0] < cutoff:
+            self._pop()
+
+    def _pop(self):
+        _, vals = self.rows.popleft()
+        for k, v in vals.items():
+            self.sums[k] -= v
+            self.counts[k] -= 1
+        self._evicted += 1
+        if self._evicted >= 10 * self.size:
+            self._evicted = 0
+            self.sums = {k: 0.0 for k in self.sums}
+            self.counts = {k: 0 for k in self.counts}
+            for _, vals in self.rows:
+                for k, v in vals.items():
+                    self.sums[k] += v
+                    self.counts[k] += 1
+
+    def means(self) -> Dict[str, Optional[float]]:
+        return {k: (self.sums[k] / n if n else None) for k, n in self.counts.items()}
+
+class GroupedWindows:
+    """One ``RollingWindow`` overall and one per group (e.g. model).
+
+    At most ``max_groups`` groups are tracked; the least recently updated
+    one is dropped first.
+    """
+
+    def __init__(self, size: int = 1000, seconds: Optional[float] = None, max_groups: int = 50):
+        self.size, self.seconds, self.max_groups = size, seconds, max_groups
+        self.overall = RollingWindow(size, seconds)
+        self.groups: "OrderedDict[str, RollingWindow]" = OrderedDict()
+
+    def add(self, group: str, values: Dict[str, Optional[float]], ts: Optional[float] = None):
+        self.overall.add(values, ts)
+        win = self.groups.get(group)
+        if win is None:
+            win = self.groups[group] = RollingWindow(self.size, self.seconds)
+            while len(self.groups) > self.max_groups:
+                self.groups.popitem(last=False)
+        self.groups.move_to_end(group)
+        win.add(values, ts)
+
+    def snapshot(self) -> Dict:
+        self.overall.expire()
+        for win in self.groups.values():
+            win.expire()
+        return {"n": len(self.overall), **self.overall.means(),
+                "groups": {g: {"n": len(w), **w.means()} for g, w in self.groups.items() if len(w)}}
+
+def breached(means: Dict[str, Optional[float]], rules: Dict[str, dict]) -> List[dict]:
+    """Rules such as ``{"relevance_mean": {"min": 0.5}}`` that ``means`` violates."""
+    out = []
+    for metric, rule in (rules or {}).items():
+        value = means.get(metric)
+        if value is None:
+            continue
+        if rule.get('min') is not None and value < rule['min']:
+            out.append({"metric": metric, "value": value, "min": rule['min']})
+        elif rule.get('max') is not None and value > rule['max']:
+            out.append({"metric": metric, "value": value, "max": rule['max']})
+    return out
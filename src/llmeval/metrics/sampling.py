@@ -0,0 +1,137 @@
+import math, random
+from statistics import NormalDist
+from typing import Dict, List, Optional
+import numpy as np
+
+def stratum_key(item: dict, gen: dict, fields: Optional[List[str]] = None) -> str:
+    """Stratum label from the dataset ``groups`` (optionally only ``fields``) and the model."""
+    groups = item.get('groups') or {}
+    keys = fields if fields is not None else sorted(groups)
+    parts = [f"{k}={groups.get(k)}" for k in keys]
+    return "|".join([f"model={gen.get('model', 'unknown')}"] + parts)
+
+def stratified_order(strata: List[str], seed: int = 0) -> List[int]:
+    """Random order in which every prefix is (nearly) proportionally stratified.
+
+    Items are shuffled within their stratum and then interleaved by their
+    relative position ``(rank + u) / n_h``, so stopping after any number of
+    rows leaves each stratum represented in proportion to its size.
+    """
+    rng = random.Random(seed)
+    by_stratum: Dict[str, List[int]] = {}
+    for i, s in enumerate(strata):
+        by_stratum.setdefault(s, []).append(i)
+    keyed = []
+    for idx in by_stratum.values():
+        rng.shuffle(idx)
+        n = len(idx)
+        keyed.extend(((rank + rng.random()) / n, i) for rank, i in enumerate(idx))
+    keyed.sort()
+    return [i for _, i in keyed]
+
+def stratified_mean_ci(values: np.ndarray, strata: np.ndarray, pop_sizes: Dict[str, int],
+                       confidence: float = 0.95, method: str = 'analytic', n_boot: int = 1000, seed: int = 0,
+                       max_cells: int = 20_000_000):
+    """Stratified mean and confidence interval; NaN values are ignored.
+
+    ``analytic`` uses the normal approximation with the finite population
+    correction; ``bootstrap`` resamples within strata, drawing resamples in
+    chunks of at most ``max_cells / 4`` indices. When ``n_boot`` times the
+    number of values exceeds ``max_cells`` the normal approximation is used
+    instead, which is accurate at that size anyway. Strata with no
+    observations yet are left out and the remaining weights renormalised.
+    """
+    ok = ~np.isnan(values)
+    values, strata = values[ok], strata[ok]
+    if not len(values):
+        return None
+    labels = np.unique(strata)
+    groups = [values[strata == h] for h in labels]
+    w = np.array([pop_sizes.get(h, len(g)) for h, g in zip(labels, groups)], dtype=float)
+    w /= w.sum()
+    means = np.array([g.mean() for g in groups])
+    mean = float(w @ means)
+    if len(values) < 2:
+        return {"mean": mean, "ci_low": None, "ci_high": None, "width": math.inf, "n": int(len(values))}
+    if method == 'bootstrap' and n_boot * len(values) <= max_cells:
+        rng = np.random.default_rng(seed)
+        boot = np.zeros(n_boot)
+        for wh, g in zip(w, groups):
+            chunk = max(1, max_cells // (4 * len(g)))
+            for start in range(0, n_boot, chunk):
+                k = min(chunk, n_boot - start)
+                boot[start:start + k] += wh * g[rng.integers(0, len(g), size=(k, len(g)))].mean(axis=1)
+        tail = (1 - confidence) / 2
+        lo, hi = (float(x) for x in np.quantile(boot, [tail, 1 - tail]))
+    else:
+        pooled = float(values.var(ddof=1))
+        var = 0.0
+        for wh, g, h in zip(w, groups, labels):
+            s2 = float(g.var(ddof=1)) if len(g) > 1 else pooled
+            fpc = max(0.0, 1 - len(g) / pop_sizes.get(h, len(g))) if pop_sizes.get(h) else 1.0
+            var += wh * wh * s2 / len(g) * fpc
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        lo, hi = mean - z * math.sqrt(var), mean + z * math.sqrt(var)
+    return {"mean": mean, "ci_low": lo, "ci_high": hi, "width": hi - lo, "n": int(len(values))}
+
+class AdaptiveSampler:
+    """Evaluate rows in stratified random order until every CI is narrow enough.
+
+    ``ci_width`` is the target full interval width, either one number or a
+    dict per aggregate with an optional ``default``.
+    """
+
+    def __init__(self, strata: List[str], ci_width=0.05, confidence=0.95, min_rows=50,
+                 check_every=50, method='analytic', n_boot=1000, seed=0):
+        self.strata = np.array(strata, dtype=object)
+        self.pop_sizes: Dict[str, int] = {}
+        for s in strata:
+            self.pop_sizes[s] = self.pop_sizes.get(s, 0) + 1
+        self.order = stratified_order(strata, seed)
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.min_rows = min_rows
+        self.check_every = max(1, check_every)
+        self.method = method
+        self.n_boot = n_boot
+        self.seed = seed
+        self._idx: List[int] = []
+        self._vals: Dict[str, List[float]] = {}
+        self.last_estimates: Dict[str, dict] = {}
+
+    def target(self, name):
+        if isinstance(self.ci_width, dict):
+            return self.ci_width.get(name, self.ci_width.get('default', math.inf))
+        return self.ci_width
+
+    def add(self, idx: int, values: Dict[str, Optional[float]]):
+        n = len(self._idx)
+        self._idx.append(idx)
+        for k, v in values.items():
+            col = self._vals.setdefault(k, [math.nan] * n)
+            col.append(math.nan if v is None else float(v))
+        for col in self._vals.values():
+            if len(col) < n + 1:
+                col.append(math.nan)
+
+    def estimates(self) -> Dict[str, dict]:
+        strata = self.strata[np.array(self._idx, dtype=int)] if self._idx else np.array([], dtype=object)
+        out = {}
+        for k, col in self._vals.items():
+            est = stratified_mean_ci(np.array(col, dtype=float), strata, self.pop_sizes,
+                                     self.confidence, self.method, self.n_boot, self.seed)
+            if est is not None:
+                out[k] = {**est, "target_width": self.target(k)}
+        self.last_estimates = out
+        return out
+
+    def should_stop(self) -> bool:
+        n = len(self._idx)
+        if n < self.min_rows or n % self.check_every:
+            return False
+        est = self.estimates()
+        return bool(est) and all(e['width'] <= e['target_width'] for e in est.values())
+
+    @property
+    def fraction(self) -> float:
+        return len(self._idx) / len(self.strata) if len(self.strata) else 0.0
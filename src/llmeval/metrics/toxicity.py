@@ -1,8 +1,29 @@
 from ..utils.common import read_wordlist
+from functools import lru_cache
 import re
 
+_TOKEN = re.compile(r"[\w']+")
+
+@lru_cache(maxsize=None)
+def load_lexicon(wordlist_path: str) -> frozenset:
+    # read once per path; toxicity_lite is called for every row
+    return frozenset(read_wordlist(wordlist_path))
+
 def toxicity_lite(text: str, wordlist_path: str):
-    wl = read_wordlist(wordlist_path)
-    toks = re.findall(r"[\w']+", text.lower())
+    wl = load_lexicon(wordlist_path)
+    toks = _TOKEN.findall(text.lower())
     hits = [t for t in toks if t in wl]
     return {"toxic_hits": len(hits), "terms": hits[:5]}
+
+def local_verdict(tox: dict, toxic_min_hits: int = 2, trust_clean: bool = False):
+    """Classify a ``toxicity_lite`` result as 'clean', 'toxic' or None (undecided).
+
+    No hits only counts as 'clean' with ``trust_clean``: a small lexicon misses
+    most harmful text, so by default only clearly toxic items are decided.
+    """
+    hits = tox.get("toxic_hits", 0)
+    if hits == 0:
+        return "clean" if trust_clean else None
+    if hits >= toxic_min_hits:
+        return "toxic"
+    return None
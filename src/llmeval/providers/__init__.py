@@ -1,18 +1,57 @@
-from .openai_provider import OpenAIProvider
-from .generic_http_provider import GenericHTTPProvider
-from .local_provider import LocalProvider
-from .gemini_provider import GeminiProvider
-from .gorq_provider import GorqProvider
+import importlib, threading
+
+# name -> (module, class). Provider modules pull in ``requests`` and friends,
+# so they are only imported once ``get_provider`` asks for them.
+PROVIDERS = {
+    'openai': ('.openai_provider', 'OpenAIProvider'),
+    'gemini': ('.gemini_provider', 'GeminiProvider'),
+    'gorq': ('.gorq_provider', 'GorqProvider'),
+    'generic': ('.generic_http_provider', 'GenericHTTPProvider'),
+    'local': ('.local_provider', 'LocalProvider'),
+}
+_CLASS_TO_NAME = {cls: name for name, (_, cls) in PROVIDERS.items()}
+
+def _load(name: str):
+    mod, cls = PROVIDERS[name]
+    return getattr(importlib.import_module(mod, __name__), cls)
+
+def provider_class(name: str):
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown provider: {name}')
+    return _load(name)
 
 def get_provider(name: str, **kwargs):
-    if name == 'openai':
-        return OpenAIProvider(**kwargs.get('openai', {}))
-    if name == 'gemini':
-        return GeminiProvider(**kwargs.get('gemini', {}))
-    if name == 'gorq':
-        return GorqProvider(**kwargs.get('gorq', {}))
-    if name == 'generic':
-        return GenericHTTPProvider(**kwargs.get('generic', {}))
-    if name == 'local':
-        return LocalProvider(**kwargs.get('local', {}))
-    raise ValueError(f'Unknown provider: {name}')
+    return provider_class(name)(**kwargs.get(name, {}))
+
+class ThreadLocalAttr:
+    """Instance attribute with one value per thread.
+
+    Providers record ``last_usage`` after each call; with judging,
+    moderation and calibration running on several threads against one
+    provider, a plain attribute could hand one call's usage to another.
+    """
+
+    def __set_name__(self, owner, name):
+        self.key = f"_local_{name}"
+
+    def _local(self, obj):
+        local = obj.__dict__.get(self.key)
+        return local if local is not None else obj.__dict__.setdefault(self.key, threading.local())
+
+    def __get__(self, obj, owner=None):
+        return self if obj is None else getattr(self._local(obj), 'value', None)
+
+    def __set__(self, obj, value):
+        self._local(obj).value = value
+
+def unwrap(provider):
+    """Innermost provider under instrumentation/coalescing wrappers."""
+    while getattr(provider, 'provider', None) is not None:
+        provider = provider.provider
+    return provider
+
+def __getattr__(attr):
+    # keep ``from llmeval.providers import OpenAIProvider`` working
+    if attr in _CLASS_TO_NAME:
+        return _load(_CLASS_TO_NAME[attr])
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
@@ -0,0 +1,129 @@
+import copy, hashlib, json, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+def _nbytes(value):
+    """Rough in-memory size of a judge verdict or an embedding vector."""
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], (int, float)):
+        return 8 * len(value) + 64
+    return len(json.dumps(value, default=str)) + 64
+
+class CoalescingProvider:
+    """Sends each distinct judge prompt and embed text to ``provider`` once.
+
+    Every request is keyed (prompt and rubric for ``judge``, the text for
+    ``embed``). A request whose key is in flight waits on that call's future
+    instead of calling the provider again; futures are dropped as soon as
+    they resolve. Finished results answer later repeats, such as several
+    models giving the same output, from a small LRU holding at most
+    ``max_bytes`` of results per call type (``0`` keeps none). Duplicate
+    texts inside one ``embed`` batch are sent once and fanned back out.
+    Failed calls are not remembered. Saved calls are counted in ``metrics``
+    under ``<prefix>coalesce.*``.
+
+    Wrap it around the ``InstrumentedProvider`` so request counts there
+    reflect real calls.
+    """
+
+    def __init__(self, provider, metrics=None, max_bytes=64 << 20, prefix=""):
+        self.provider = provider
+        self.metrics = metrics
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # in-flight calls by key, then finished results as key -> (value, nbytes)
+        self._inflight = {'judge': {}, 'embed': {}}
+        self._done = {'judge': OrderedDict(), 'embed': OrderedDict()}
+        self._bytes = {'judge': 0, 'embed': 0}
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def _incr(self, key, n=1):
+        if self.metrics is not None and n:
+            self.metrics.incr(f"{self.prefix}coalesce.{key}", n)
+
+    def _claim(self, kind, key):
+        """``(future, leader)``; the leader must resolve the future. Call with the lock held."""
+        done = self._done[kind]
+        if key in done:
+            done.move_to_end(key)
+            fut = Future()
+            fut.set_result(done[key][0])
+            return fut, False
+        fut = self._inflight[kind].get(key)
+        if fut is not None:
+            return fut, False
+        fut = self._inflight[kind][key] = Future()
+        return fut, True
+
+    def _finish(self, kind, items):
+        """Resolve the leader's ``(key, future, value)`` items and remember the values."""
+        with self._lock:
+            done = self._done[kind]
+            for key, fut, value in items:
+                if self._inflight[kind].get(key) is fut:
+                    del self._inflight[kind][key]
+                size = _nbytes(value)
+                if size > self.max_bytes:
+                    continue
+                if key in done:
+                    self._bytes[kind] -= done.pop(key)[1]
+                done[key] = (value, size)
+                self._bytes[kind] += size
+                while self._bytes[kind] > self.max_bytes:
+                    self._bytes[kind] -= done.popitem(last=False)[1][1]
+        for _, fut, value in items:
+            fut.set_result(value)
+
+    def _fail(self, kind, items, exc):
+        with self._lock:
+            for key, fut in items:
+                if self._inflight[kind].get(key) is fut:
+                    del self._inflight[kind][key]
+        for _, fut in items:
+            fut.set_exception(exc)
+
+    def judge(self, prompt, rubric_json):
+        key = hashlib.sha256(json.dumps([prompt, rubric_json], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        with self._lock:
+            fut, leader = self._claim('judge', key)
+        if leader:
+            try:
+                res = self.provider.judge(prompt, rubric_json)
+            except Exception as exc:
+                self._fail('judge', [(key, fut)], exc)
+                raise
+            self._finish('judge', [(key, fut, res)])
+        else:
+            self._incr('judge.saved')
+        return copy.deepcopy(fut.result())  # callers may annotate their copy
+
+    def embed(self, texts):
+        texts = list(texts)
+        futs, owned = {}, []
+        with self._lock:
+            for t in dict.fromkeys(texts):
+                futs[t], leader = self._claim('embed', t)
+                if leader:
+                    owned.append(t)
+        self._incr('embed.saved_texts', len(texts) - len(owned))
+        if owned:
+            try:
+                embs = self.provider.embed(owned)
+                if len(embs) != len(owned):
+                    raise RuntimeError(f"provider returned {len(embs)} embeddings for {len(owned)} texts")
+            except Exception as exc:
+                self._fail('embed', [(t, futs[t]) for t in owned], exc)
+                raise
+            self._finish('embed', [(t, futs[t], e) for t, e in zip(owned, embs)])
+        elif texts:
+            self._incr('embed.saved_calls')
+        return [futs[t].result() for t in texts]
+
+    def cache_bytes(self):
+        """Bytes of finished results currently held, per call type."""
+        with self._lock:
+            return dict(self._bytes)
@@ -2,7 +2,7 @@ import json
 import os
 from typing import Any, Dict, List, Optional
 
-import requests
+from . import transport, ThreadLocalAttr
 
 
 class GeminiProvider:
@@ -13,6 +13,8 @@ class GeminiProvider:
     OpenAI adapter is currently used.
     """
 
+    last_usage = ThreadLocalAttr()
+
     def __init__(
         self,
         model: str = "gemini-2.5-flash",
@@ -30,6 +32,7 @@ class GeminiProvider:
         self.generation_config = generation_config or {}
         self.safety_settings = safety_settings or []
         self.timeout = timeout
+        self.last_usage = None
 
     # ------------------------------------------------------------------
     # Helpers
@@ -47,6 +50,18 @@ class GeminiProvider:
             return None
         return {"key": self.api_key}
 
+    @staticmethod
+    def _usage(data: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        # map usageMetadata onto the OpenAI-style usage keys the instrumentation reads
+        meta = data.get("usageMetadata") or {}
+        if not meta:
+            return None
+        return {
+            "prompt_tokens": meta.get("promptTokenCount", 0),
+            "completion_tokens": meta.get("candidatesTokenCount", 0),
+            "total_tokens": meta.get("totalTokenCount", 0),
+        }
+
     def _model_path(self, name: str) -> str:
         return name if name.startswith("models/") else f"models/{name}"
 
@@ -74,7 +89,7 @@ class GeminiProvider:
             payload["safetySettings"] = self.safety_settings
 
         url = f"{self.base_url}/models/{self.model}:generateContent"
-        response = requests.post(
+        response = transport.post(
             url,
             headers=self._headers(),
             params=self._params(),
@@ -83,12 +98,44 @@ class GeminiProvider:
         )
         response.raise_for_status()
         data = response.json()
+        self.last_usage = self._usage(data)
         try:
             text = data["candidates"][0]["content"]["parts"][0]["text"]
         except (KeyError, IndexError) as exc:
             raise RuntimeError(f"Unexpected Gemini response: {data}") from exc
         return json.loads(text)
 
+    def generate(self, prompt: str, n: int = 1, system: str = "", **params) -> List[str]:
+        """Return ``n`` candidates for ``prompt`` from one request (``candidateCount``)."""
+
+        payload: Dict[str, Any] = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {**self.generation_config, **params, "candidateCount": n},
+        }
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        if self.safety_settings:
+            payload["safetySettings"] = self.safety_settings
+
+        url = f"{self.base_url}/models/{self.model}:generateContent"
+        response = transport.post(
+            url,
+            headers=self._headers(),
+            params=self._params(),
+            json=payload,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        self.last_usage = self._usage(data)
+        outputs = []
+        for candidate in data.get("candidates", []):
+            parts = (candidate.get("content") or {}).get("parts") or []
+            outputs.append("".join(part.get("text", "") for part in parts))
+        if not outputs:
+            raise RuntimeError(f"Unexpected Gemini response: {data}")
+        return outputs
+
     def embed(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
@@ -99,7 +146,7 @@ class GeminiProvider:
                 {"content": {"parts": [{"text": text}]}} for text in texts
             ],
         }
-        response = requests.post(
+        response = transport.post(
             url,
             headers=self._headers(),
             params=self._params(),
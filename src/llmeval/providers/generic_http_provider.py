@@ -1,14 +1,16 @@
-import requests, json
+import json
+from . import transport
 
 class GenericHTTPProvider:
-    def __init__(self, judge_url='', embed_url='', headers=None):
+    def __init__(self, judge_url='', embed_url='', headers=None, generate_url=''):
         self.judge_url = judge_url
         self.embed_url = embed_url
+        self.generate_url = generate_url
         self.headers = headers or {}
 
     def judge(self, prompt: str, rubric_json: dict):
         payload = {"prompt": prompt, "rubric": rubric_json}
-        r = requests.post(self.judge_url, headers=self.headers, data=json.dumps(payload), timeout=120)
+        r = transport.post(self.judge_url, headers=self.headers, data=json.dumps(payload), timeout=120)
         r.raise_for_status()
         return r.json()
 
@@ -16,9 +18,18 @@ class GenericHTTPProvider:
         if not self.embed_url:
             raise RuntimeError("embed_url not set for GenericHTTPProvider")
         payload = {"texts": texts}
-        r = requests.post(self.embed_url, headers=self.headers, data=json.dumps(payload), timeout=120)
+        r = transport.post(self.embed_url, headers=self.headers, data=json.dumps(payload), timeout=120)
         r.raise_for_status()
         return r.json().get("embeddings", [])
 
+    def generate(self, prompt: str, n: int = 1, system: str = '', **params):
+        # expects {"outputs": [...]} with n entries
+        if not self.generate_url:
+            raise RuntimeError("generate_url not set for GenericHTTPProvider")
+        payload = {"prompt": prompt, "n": n, "system": system, **params}
+        r = transport.post(self.generate_url, headers=self.headers, data=json.dumps(payload), timeout=120)
+        r.raise_for_status()
+        return r.json().get("outputs", [])
+
     def moderate(self, text: str):
         return {}
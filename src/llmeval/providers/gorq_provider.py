@@ -1,6 +1,7 @@
 import os
 import json
-import requests
+
+from . import transport, ThreadLocalAttr
 
 
 class GorqProvider:
@@ -11,6 +12,8 @@ class GorqProvider:
     and default base URL differ.
     """
 
+    last_usage = ThreadLocalAttr()
+
     def __init__(
         self,
         model: str = "llama-3.1-70b-versatile",
@@ -25,6 +28,7 @@ class GorqProvider:
         self.base_url = base_url or os.getenv(
             "GORQ_BASE_URL", "https://api.groq.com/openai/v1"
         )
+        self.last_usage = None
 
     def _headers(self) -> dict:
         return {
@@ -41,7 +45,7 @@ class GorqProvider:
             ],
             "response_format": {"type": "json_object"},
         }
-        response = requests.post(
+        response = transport.post(
             f"{self.base_url}/chat/completions",
             headers=self._headers(),
             data=json.dumps(payload),
@@ -49,6 +53,7 @@ class GorqProvider:
         )
         response.raise_for_status()
         body = response.json()
+        self.last_usage = body.get("usage")
         content = body["choices"][0]["message"]["content"]
         return json.loads(content)
 
@@ -56,7 +61,7 @@ class GorqProvider:
         if not self.embedding_model:
             raise RuntimeError("embedding_model not configured for GorqProvider")
         payload = {"model": self.embedding_model, "input": texts}
-        response = requests.post(
+        response = transport.post(
             f"{self.base_url}/embeddings",
             headers=self._headers(),
             data=json.dumps(payload),
@@ -64,13 +69,14 @@ class GorqProvider:
         )
         response.raise_for_status()
         body = response.json()
+        self.last_usage = body.get("usage")
         return [item["embedding"] for item in body.get("data", [])]
 
     def moderate(self, text: str):
         if not self.moderation:
             return {}
         payload = {"model": "omni-moderation-latest", "input": text}
-        response = requests.post(
+        response = transport.post(
             f"{self.base_url}/moderations",
             headers=self._headers(),
             data=json.dumps(payload),
@@ -78,3 +84,43 @@ class GorqProvider:
         )
         response.raise_for_status()
         return response.json()
+
+    def moderate_batch(self, texts):
+        """Moderate several texts in one request; returns one result per text."""
+        if not self.moderation or not texts:
+            return [{} for _ in texts]
+        payload = {"model": "omni-moderation-latest", "input": list(texts)}
+        response = transport.post(
+            f"{self.base_url}/moderations",
+            headers=self._headers(),
+            data=json.dumps(payload),
+            timeout=60,
+        )
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    def generate(self, prompt: str, n: int = 1, system: str = "", **params):
+        """Return ``n`` completions for ``prompt``.
+
+        Groq's chat endpoint only accepts ``n=1``, so samples are separate
+        requests over the shared connection pool; usage is summed.
+        """
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"model": self.model, "messages": messages, **params}
+        outputs, usage = [], {}
+        for _ in range(n):
+            response = transport.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                data=json.dumps(payload),
+                timeout=120,
+            )
+            response.raise_for_status()
+            body = response.json()
+            for key, value in (body.get("usage") or {}).items():
+                if isinstance(value, (int, float)):
+                    usage[key] = usage.get(key, 0) + value
+            outputs.append(body["choices"][0]["message"]["content"])
+        self.last_usage = usage or None
+        return outputs
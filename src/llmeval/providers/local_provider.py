@@ -1,9 +1,10 @@
 import importlib
 
 class LocalProvider:
-    def __init__(self, judge_callable='', embed_callable=''):
+    def __init__(self, judge_callable='', embed_callable='', generate_callable=''):
         self.judge_fn = self._resolve(judge_callable) if judge_callable else None
         self.embed_fn = self._resolve(embed_callable) if embed_callable else None
+        self.generate_fn = self._resolve(generate_callable) if generate_callable else None
 
     def _resolve(self, dotted):
         mod, fn = dotted.rsplit('.',1)
@@ -19,5 +20,11 @@ class LocalProvider:
             raise RuntimeError('No local embed callable configured')
         return self.embed_fn(texts)
 
+    def generate(self, prompt: str, n: int = 1, system: str = '', **params):
+        # the callable returns a list of n outputs
+        if not self.generate_fn:
+            raise RuntimeError('No local generate callable configured')
+        return list(self.generate_fn(prompt, n=n, system=system, **params))
+
     def moderate(self, text: str):
         return {}
@@ -1,12 +1,16 @@
-import os, requests, json
+import os, json
+from . import transport, ThreadLocalAttr
 
 class OpenAIProvider:
+    last_usage = ThreadLocalAttr()
+
     def __init__(self, model='gpt-4o-mini', embedding_model='text-embedding-3-large', moderation=True):
         self.model = model
         self.embedding_model = embedding_model
         self.moderation = moderation
         self.api_key = os.getenv('OPENAI_API_KEY','')
         self.base_url = os.getenv('OPENAI_BASE','https://api.openai.com/v1')
+        self.last_usage = None
 
     def judge(self, prompt: str, rubric_json: dict):
         # simple JSON-instruction call
@@ -18,32 +22,59 @@ class OpenAIProvider:
             ],
             "response_format": {"type":"json_object"}
         }
-        r = requests.post(f"{self.base_url}/chat/completions",
-                          headers={"Authorization": f"Bearer {self.api_key}",
-                                   "Content-Type":"application/json"},
-                          data=json.dumps(payload), timeout=120)
+        r = transport.post(f"{self.base_url}/chat/completions",
+                           headers={"Authorization": f"Bearer {self.api_key}",
+                                    "Content-Type":"application/json"},
+                           data=json.dumps(payload), timeout=120)
         r.raise_for_status()
         js = r.json()
+        self.last_usage = js.get("usage")
         txt = js["choices"][0]["message"]["content"]
         return json.loads(txt)
 
     def embed(self, texts):
         payload = {"model": self.embedding_model, "input": texts}
-        r = requests.post(f"{self.base_url}/embeddings",
-                          headers={"Authorization": f"Bearer {self.api_key}",
-                                   "Content-Type":"application/json"},
-                          data=json.dumps(payload), timeout=120)
+        r = transport.post(f"{self.base_url}/embeddings",
+                           headers={"Authorization": f"Bearer {self.api_key}",
+                                    "Content-Type":"application/json"},
+                           data=json.dumps(payload), timeout=120)
         r.raise_for_status()
         js = r.json()
+        self.last_usage = js.get("usage")
         return [item["embedding"] for item in js["data"]]
 
     def moderate(self, text: str):
         if not self.moderation:
             return {}
         payload = {"model":"omni-moderation-latest","input":text}
-        r = requests.post(f"{self.base_url}/moderations",
-                          headers={"Authorization": f"Bearer {self.api_key}",
-                                   "Content-Type":"application/json"},
-                          data=json.dumps(payload), timeout=60)
+        r = transport.post(f"{self.base_url}/moderations",
+                           headers={"Authorization": f"Bearer {self.api_key}",
+                                    "Content-Type":"application/json"},
+                           data=json.dumps(payload), timeout=60)
         r.raise_for_status()
         return r.json()
+
+    def moderate_batch(self, texts):
+        # the moderation endpoint accepts an array input; one result per text
+        if not self.moderation or not texts:
+            return [{} for _ in texts]
+        payload = {"model":"omni-moderation-latest","input":list(texts)}
+        r = transport.post(f"{self.base_url}/moderations",
+                           headers={"Authorization": f"Bearer {self.api_key}",
+                                    "Content-Type":"application/json"},
+                           data=json.dumps(payload), timeout=60)
+        r.raise_for_status()
+        return r.json().get("results", [])
+
+    def generate(self, prompt: str, n: int = 1, system: str = "", **params):
+        # one request returns all n completions
+        messages = ([{"role":"system","content":system}] if system else []) + [{"role":"user","content":prompt}]
+        payload = {"model": self.model, "messages": messages, "n": n, **params}
+        r = transport.post(f"{self.base_url}/chat/completions",
+                           headers={"Authorization": f"Bearer {self.api_key}",
+                                    "Content-Type":"application/json"},
+                           data=json.dumps(payload), timeout=120)
+        r.raise_for_status()
+        js = r.json()
+        self.last_usage = js.get("usage")
+        return [c["message"]["content"] for c in js["choices"]]
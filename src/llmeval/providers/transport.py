@@ -0,0 +1,100 @@
+"""Shared HTTP transport for the HTTP providers.
+
+All provider requests in a process go through one pooled ``requests.Session``
+so judging, embedding and generation reuse keep-alive connections. Optional
+per-host rate limits (a token bucket shared by every thread) and retries on
+429/5xx are set from the config's ``http`` block via ``configure``.
+"""
+import threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DEFAULTS = {"max_connections": 32, "requests_per_minute": None, "max_retries": 0, "backoff_s": 1.0}
+_SETTINGS = dict(DEFAULTS)
+_LOCK = threading.Lock()
+_session = None
+_limiters = {}
+
+def configure(**settings):
+    """Set transport settings; omitted or ``None`` ones take their ``DEFAULTS``.
+
+    Each call replaces the previous configuration rather than layering on it,
+    so one service job's ``http`` block does not leak into the next.
+    """
+    global _session
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown http settings: {', '.join(sorted(unknown))}")
+    with _LOCK:
+        new = {**DEFAULTS, **{k: v for k, v in settings.items() if v is not None}}
+        if new == _SETTINGS:
+            return  # keep the warm pool (the eval service configures once per job)
+        _SETTINGS.update(new)
+        _session = None
+        _limiters.clear()
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per ``per`` seconds across threads."""
+
+    def __init__(self, rate, per=60.0):
+        self.capacity = max(1.0, float(rate))
+        self.fill = float(rate) / per
+        self.tokens = self.capacity
+        self.t = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.fill)
+                self.t = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill
+            time.sleep(wait)
+
+def session():
+    global _session
+    with _LOCK:
+        if _session is None:
+            s = requests.Session()
+            n = int(_SETTINGS["max_connections"])
+            adapter = HTTPAdapter(pool_connections=n, pool_maxsize=n)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+def limiter(url):
+    rpm = _SETTINGS["requests_per_minute"]
+    if not rpm:
+        return None
+    host = urlsplit(url).netloc
+    with _LOCK:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(rpm)
+        return _limiters[host]
+
+def post(url, **kwargs):
+    """``requests.post`` through the shared session, rate limit and retry policy.
+
+    Returns the last response; callers still ``raise_for_status`` as before.
+    """
+    retries = int(_SETTINGS["max_retries"])
+    for attempt in range(retries + 1):
+        lim = limiter(url)
+        if lim is not None:
+            lim.acquire()
+        r = session().post(url, **kwargs)
+        if r.status_code not in RETRY_STATUS or attempt == retries:
+            return r
+        try:
+            delay = float(r.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            delay = _SETTINGS["backoff_s"] * 2 ** attempt
+        time.sleep(delay)
+    return r
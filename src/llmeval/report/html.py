@@ -1,5 +1,5 @@
+from functools import lru_cache
 from jinja2 import Template
-import pandas as pd, json, os
 
 TPL = """<!doctype html>
 <html><head><meta charset="utf-8"><title>LLM Eval Report</title>
@@ -32,7 +32,42 @@ TPL = """<!doctype html>
 </table>
 </body></html>"""
 
+@lru_cache(maxsize=None)
+def _template(src):
+    # compiling is the bulk of a small report's cost; reuse across runs in one process
+    return Template(src)
+
 def render_report(rows, aggregates, models, out_path):
-    html = Template(TPL).render(rows=rows, aggregates=aggregates, models=", ".join(sorted(models)))
+    html = _template(TPL).render(rows=rows, aggregates=aggregates, models=", ".join(sorted(models)))
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(html)
+
+DIFF_TPL = """<!doctype html>
+<html><head><meta charset="utf-8"><title>LLM Eval Comparison</title>
+<style>body{font-family:system-ui,Arial;margin:24px} table{border-collapse:collapse} td,th{border:1px solid #ddd;padding:6px 10px} .bad{background:#fde2e2} .good{background:#e2f5e2}</style>
+</head><body>
+<h1>LLM Evaluation Comparison</h1>
+<p>Baseline: {{ baseline }}</p>
+{% for run in runs %}
+<h2>{{ run }}</h2>
+<table>
+<tr><th>metric</th><th>group</th><th>n</th><th>mean delta</th><th>CI</th><th>p</th><th>q</th></tr>
+{% for r in results if r.run == run %}
+<tr class="{{ ('good' if r.improved else 'bad') if r.significant else '' }}">
+<td>{{r.metric}}</td>
+<td>{{ (r.group ~ "=" ~ r.value) if r.group else "all" }}</td>
+<td>{{r.n}}</td>
+<td>{{"%+.4f"%r.mean_delta if r.mean_delta is not none else ""}}</td>
+<td>{{"[%.4f, %.4f]"%(r.ci_low, r.ci_high) if r.ci_low is not none else ""}}</td>
+<td>{{"%.3g"%r.p_value if r.p_value is not none else ""}}</td>
+<td>{{"%.3g"%r.q_value if r.q_value is not none else ""}}</td>
+</tr>
+{% endfor %}
+</table>
+{% endfor %}
+</body></html>"""
+
+def render_diff_report(summary, out_path):
+    html = _template(DIFF_TPL).render(**summary)
     with open(out_path, "w", encoding="utf-8") as f:
         f.write(html)
@@ -0,0 +1,203 @@
+"""Compare evaluation runs item by item.
+
+    python -m llmeval.runners.compare reports/base reports/candidate --dataset data/examples/qa.jsonl
+
+The first run is the baseline; every other run is joined to it on item ID
+(and model, when a run scores several models per ID) and compared with paired
+tests. Writes ``diff.json``, ``diff.csv`` and ``diff.html`` to ``--out``.
+"""
+import argparse, json, os
+
+# rubric keys and columns where a lower score is the better outcome
+LOWER_IS_BETTER = {"toxic_hits", "judge_harms", "moderation_score", "moderation_flagged"}
+NON_METRICS = {"id", "model", "terms", "judge_tier", "metric_verdict", "moderation_source", "judge_scores"}
+
+def load_run(path):
+    """Load a run's ``summary.json`` (or a path to the file itself) as a DataFrame."""
+    import pandas as pd
+    from llmeval.utils.common import load_json
+    if os.path.isdir(path):
+        path = os.path.join(path, 'summary.json')
+    records = load_json(path)
+    df = pd.DataFrame.from_records(records, columns=list(records[0]) if records else None)
+    if 'judge_scores' in df:
+        judge = pd.DataFrame.from_records([x if isinstance(x, dict) else {} for x in df['judge_scores']], index=df.index)
+        df = df.drop(columns='judge_scores').join(judge.add_prefix('judge_'))
+    for col in df.columns:
+        if df[col].dtype == bool:
+            df[col] = df[col].astype(float)
+    return df
+
+def join_key(frames):
+    """``['id']``, or ``['id', 'model']`` when a run has several rows per ID.
+
+    Raises ValueError when the key is still not unique in some run, since
+    joining on it would pair every duplicate with every other.
+    """
+    dup = any(f['id'].duplicated().any() for f in frames)
+    key = ['id', 'model'] if dup and all('model' in f for f in frames) else ['id']
+    for i, f in enumerate(frames):
+        n = int(f.duplicated(subset=key).sum())
+        if n:
+            hint = "" if 'model' in key else " (and not every run has a 'model' column)"
+            raise ValueError(f"{'the baseline' if i == 0 else 'the compared run'} repeats "
+                             f"{'/'.join(key)} on {n} rows{hint}; compare needs one row per {'/'.join(key)}")
+    return key
+
+def metric_columns(a, b):
+    import pandas as pd
+    cols = []
+    for c in a.columns:
+        if c in NON_METRICS or c not in b.columns:
+            continue
+        if pd.api.types.is_numeric_dtype(a[c]) and pd.api.types.is_numeric_dtype(b[c]):
+            cols.append(c)
+    return cols
+
+def paired_tests(d, n_resamples=2000, confidence=0.95, seed=0, max_cells=20_000_000):
+    """Paired bootstrap CI and sign-flip permutation p-value for mean(d).
+
+    Resamples are drawn as (chunk x n) matrices so each chunk is a handful of
+    numpy calls. When ``n_resamples * n`` exceeds ``max_cells`` the CLT normal
+    approximation is used instead; at that size the two agree closely and the
+    exact resampling would dominate runtime.
+    """
+    import numpy as np
+    from statistics import NormalDist
+    d = d[~np.isnan(d)]
+    n = len(d)
+    if n == 0:
+        return {"n": 0, "mean_delta": None, "ci_low": None, "ci_high": None, "p_value": None, "method": None}
+    mean = float(d.mean())
+    if n < 2 or not d.any():
+        return {"n": n, "mean_delta": mean, "ci_low": mean, "ci_high": mean,
+                "p_value": 1.0 if not d.any() else None, "method": "degenerate"}
+    tail = (1 - confidence) / 2
+    if n_resamples * n > max_cells:
+        se = float(d.std(ddof=1)) / np.sqrt(n)
+        z = NormalDist().inv_cdf(1 - tail)
+        # sign-flip null: mean(s*d) has sd sqrt(sum d^2)/n
+        z_obs = abs(mean) / (np.sqrt(float((d * d).sum())) / n)
+        p = 2 * (1 - NormalDist().cdf(z_obs))
+        return {"n": n, "mean_delta": mean, "ci_low": mean - z * se, "ci_high": mean + z * se,
+                "p_value": float(p), "method": "normal"}
+    rng = np.random.default_rng(seed)
+    chunk = max(1, min(n_resamples, max_cells // (4 * n) or 1))
+    boot, perm = [], []
+    for start in range(0, n_resamples, chunk):
+        k = min(chunk, n_resamples - start)
+        boot.append(d[rng.integers(0, n, size=(k, n))].mean(axis=1))
+        signs = rng.integers(0, 2, size=(k, n), dtype=np.int8) * 2 - 1
+        perm.append(signs @ d / n)
+    boot, perm = np.concatenate(boot), np.concatenate(perm)
+    lo, hi = np.quantile(boot, [tail, 1 - tail])
+    p = (1 + np.count_nonzero(np.abs(perm) >= abs(mean) - 1e-12)) / (n_resamples + 1)
+    return {"n": n, "mean_delta": mean, "ci_low": float(lo), "ci_high": float(hi),
+            "p_value": float(p), "method": "resample"}
+
+def bh_adjust(pvals):
+    """Benjamini-Hochberg q-values; ``None`` entries are passed through."""
+    import numpy as np
+    idx = [i for i, p in enumerate(pvals) if p is not None]
+    out = [None] * len(pvals)
+    if not idx:
+        return out
+    p = np.array([pvals[i] for i in idx])
+    order = np.argsort(p)
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1].clip(max=1.0)
+    for j, i in enumerate(order):
+        out[idx[i]] = float(q[j])
+    return out
+
+def compare_runs(base, other, groups=None, alpha=0.05, **test_kwargs):
+    """Paired comparison of ``other`` against ``base``.
+
+    Returns ``(rows, joined)`` where ``rows`` holds one dict per metric (and
+    per group value when ``groups`` maps IDs to group fields) and ``joined``
+    is the index-joined frame of both runs.
+    """
+    import pandas as pd
+    key = join_key([base, other])
+    cols = metric_columns(base, other)
+    joined = base.set_index(key)[cols].join(other.set_index(key)[cols], how='inner', lsuffix='_a', rsuffix='_b')
+    deltas = {c: joined[f"{c}_b"].to_numpy(float) - joined[f"{c}_a"].to_numpy(float) for c in cols}
+
+    rows = []
+    def add(metric, d, group=None, value=None):
+        res = paired_tests(d, **test_kwargs)
+        sign = -1 if metric in LOWER_IS_BETTER else 1
+        rows.append({"metric": metric, "group": group, "value": value, **res,
+                     "improved": res['mean_delta'] is not None and sign * res['mean_delta'] > 0})
+
+    for c in cols:
+        add(c, deltas[c])
+    if groups is not None and len(joined):
+        ids = joined.index.get_level_values('id')
+        g = groups.reindex(ids)
+        for field in g.columns:
+            codes, values = pd.factorize(g[field])  # missing labels get code -1
+            for code, value in enumerate(values):
+                mask = codes == code
+                for c in cols:
+                    add(c, deltas[c][mask], field, str(value))
+    for r, q in zip(rows, bh_adjust([r['p_value'] for r in rows])):
+        r['q_value'] = q
+        r['significant'] = q is not None and q < alpha
+    return rows, joined
+
+def load_groups(dataset_path):
+    """DataFrame of dataset ``groups`` fields indexed by item ID."""
+    import pandas as pd
+    from llmeval.utils.common import load_jsonl
+    recs = [{"id": r['id'], **(r.get('groups') or {})} for r in load_jsonl(dataset_path)]
+    if not recs:
+        return None
+    return pd.DataFrame.from_records(recs).drop_duplicates('id').set_index('id')
+
+def main():
+    ap = argparse.ArgumentParser(description="Paired comparison of evaluation runs (first run is the baseline)")
+    ap.add_argument('runs', nargs='+', help='Report directories or summary.json files')
+    ap.add_argument('--dataset', help='Dataset JSONL whose `groups` fields are used for per-group deltas')
+    ap.add_argument('--out', default='reports/compare')
+    ap.add_argument('--alpha', type=float, default=0.05, help='False discovery rate for significance')
+    ap.add_argument('--resamples', type=int, default=2000)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--gate', action='append', default=[], metavar='METRIC',
+                    help='Exit with status 1 if METRIC regresses significantly (repeatable)')
+    args = ap.parse_args()
+    if len(args.runs) < 2:
+        ap.error('need at least two runs to compare')
+
+    import pandas as pd
+    from llmeval.report.html import render_diff_report
+    frames = [load_run(p) for p in args.runs]
+    groups = load_groups(args.dataset) if args.dataset else None
+    os.makedirs(args.out, exist_ok=True)
+
+    results, failed = [], []
+    for path, frame in zip(args.runs[1:], frames[1:]):
+        try:
+            rows, joined = compare_runs(frames[0], frame, groups, alpha=args.alpha,
+                                        n_resamples=args.resamples, seed=args.seed)
+        except ValueError as exc:
+            ap.error(f"{path}: {exc}")
+        for r in rows:
+            r['run'] = path
+            if r['group'] is None and r['metric'] in args.gate and r['significant'] and not r['improved']:
+                failed.append(f"{path}: {r['metric']} {r['mean_delta']:+.4f} (q={r['q_value']:.3g})")
+        results.extend(rows)
+        print(f"{path}: {len(joined)} paired items vs {args.runs[0]}")
+
+    summary = {"baseline": args.runs[0], "runs": args.runs[1:], "alpha": args.alpha, "results": results}
+    with open(os.path.join(args.out, 'diff.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    pd.DataFrame(results).to_csv(os.path.join(args.out, 'diff.csv'), index=False)
+    render_diff_report(summary, os.path.join(args.out, 'diff.html'))
+    print("Done. See comparison in", args.out)
+    if failed:
+        print("Significant regressions:\n  " + "\n  ".join(failed))
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
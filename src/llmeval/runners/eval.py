@@ -1,17 +1,58 @@
-import argparse, json, os, pandas as pd, numpy as np
-from tqdm import tqdm
-from llmeval.utils.common import load_jsonl
-from llmeval.providers import get_provider
-from llmeval.metrics.relevance import relevance_scores
-from llmeval.metrics.toxicity import toxicity_lite
-from llmeval.metrics.bias import group_delta, weat_effect_size
-from llmeval.metrics.consistency import self_consistency
-from llmeval.judge.engine import JudgeEngine
-from llmeval.report.html import render_report
+import argparse, json, math, os
+from llmeval.utils.profiling import RunMetrics, InstrumentedProvider, maybe_profile
+from llmeval.providers import PROVIDERS, get_provider, provider_class
+
+# pandas, numpy, tqdm, jinja2 and the metric modules are imported inside
+# ``run`` so ``--help`` and ``--check-config`` stay fast for short-lived jobs.
+
+def validate_config(cfg):
+    """Return a list of problems that would make a run fail."""
+    problems = []
+    if cfg.get('provider', 'openai') not in PROVIDERS:
+        problems.append(f"unknown provider '{cfg.get('provider')}' (expected one of: {', '.join(PROVIDERS)})")
+    for key in ('dataset_path', 'generations_path'):
+        if not cfg.get(key):
+            problems.append(f"'{key}' is not set")
+        elif not os.path.exists(cfg[key]):
+            problems.append(f"{key} '{cfg[key]}' not found")
+    judge = cfg.get('judge') or {}
+    if not judge.get('rubric'):
+        problems.append("'judge.rubric' is not set")
+    elif not os.path.exists(judge['rubric']):
+        problems.append(f"judge.rubric '{judge['rubric']}' not found")
+    if judge.get('mode', 'pointwise') not in ('pointwise', 'pairwise'):
+        problems.append(f"judge.mode must be pointwise or pairwise, got '{judge.get('mode')}'")
+    cascade = judge.get('cascade') or {}
+    if cascade.get('enabled'):
+        if cascade.get('provider') not in PROVIDERS:
+            problems.append(f"unknown judge.cascade.provider '{cascade.get('provider')}' "
+                            f"(expected one of: {', '.join(PROVIDERS)})")
+        else:
+            import inspect
+            params = inspect.signature(provider_class(cascade['provider'])).parameters
+            unknown = [k for k in (cascade.get('provider_args') or {}) if k not in params]
+            if unknown:
+                problems.append(f"judge.cascade.provider_args: {cascade['provider']} does not take "
+                                f"{', '.join(unknown)} (it takes: {', '.join(params) or 'nothing'})")
+    if (judge.get('long_input') or {}).get('reduce', 'rule') not in ('rule', 'judge'):
+        problems.append(f"judge.long_input.reduce must be rule or judge, got '{judge['long_input'].get('reduce')}'")
+    if 'relevance' not in (cfg.get('metrics') or {}):
+        problems.append("'metrics.relevance' is not set")
+    if not (cfg.get('report') or {}).get('out_dir'):
+        problems.append("'report.out_dir' is not set")
+    return problems
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--config', required=True)
+    ap.add_argument('--profile', action='store_true',
+                    help='Run under cProfile and write profile.prof/profile.txt to the report dir')
+    ap.add_argument('--check-config', action='store_true',
+                    help='Validate the config and input paths, then exit without scoring')
+    ap.add_argument('--estimate', action='store_true',
+                    help='Print the expected tokens and cost per model, then exit without calling providers')
+    ap.add_argument('--resume', action='store_true',
+                    help='Continue a run that stopped at its budget cap (see report dir checkpoint.json)')
     args = ap.parse_args()
     import yaml
     from pathlib import Path
@@ -20,84 +61,363 @@ def main():
     if not cfg_path.exists():
         ap.error(f"Config file '{cfg_path}' not found.")
 
-    with cfg_path.open("r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
+    metrics = RunMetrics()
+    with metrics.stage('load_config'):
+        with cfg_path.open("r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
     if cfg is None:
         ap.error(f"Config file '{cfg_path}' is empty.")
+    problems = validate_config(cfg)
+    if problems:
+        ap.error("invalid config:\n  " + "\n  ".join(problems))
+    if args.check_config:
+        print("Config OK:", cfg_path)
+        return
+    if args.estimate:
+        print(json.dumps(estimate(cfg), indent=2))
+        return
+
+    out_dir = cfg['report']['out_dir']
+    os.makedirs(out_dir, exist_ok=True)
+    with maybe_profile(os.path.join(out_dir, 'profile.prof') if args.profile else None):
+        run(cfg, metrics, resume=args.resume)
+    metrics.write(os.path.join(out_dir, 'metrics.json'))
+    print("Done. See reports in", out_dir)
+
+def estimate(cfg):
+    """Expected tokens and cost of ``run(cfg)`` without calling any provider."""
+    from llmeval.utils.common import load_jsonl
+    from llmeval.utils.budget import estimate_run
+    with open(cfg['judge']['rubric'], 'r', encoding='utf-8') as f:
+        rubric = json.load(f)
+    ds = {r['id']: r for r in load_jsonl(cfg['dataset_path'])}
+    gens = list(load_jsonl(cfg['generations_path']))
+    anchors_path = cfg['judge'].get('anchors')
+    anchors = list(load_jsonl(anchors_path)) if anchors_path and os.path.exists(anchors_path) else []
+    return estimate_run(cfg, ds, gens, rubric, anchors)
+
+def run(cfg, metrics, warm=None, generations=None, resume=False):
+    """Score one run. ``warm`` (a ``serve.WarmCache``) reuses providers, data
+    and reference embeddings across runs; ``generations`` replaces
+    ``generations_path`` with in-memory rows. ``resume`` continues a run that
+    stopped at its budget cap."""
+    with metrics.stage('imports'):
+        import pandas as pd, numpy as np
+        from tqdm import tqdm
+        from llmeval.utils.common import load_json, load_jsonl, to_float
+        from llmeval.utils.store import JsonlStore
+        from llmeval.utils.budget import Budget, estimate_run, priority_order
+        from llmeval.metrics.relevance import relevance_scores
+        from llmeval.metrics.lexical import LexicalScorer
+        from llmeval.metrics.toxicity import toxicity_lite
+        from llmeval.metrics.moderation import ModerationStage
+        from llmeval.metrics.consistency import self_consistency
+        from llmeval.metrics.sampling import AdaptiveSampler, stratum_key
+        from llmeval.judge.engine import JudgeEngine, CascadeEngine
+        from llmeval.judge.longform import MapReduceEngine
+        from llmeval.report.html import render_report
+    # optional spending cap; a resumed run starts from what was already spent
+    out_dir = cfg['report']['out_dir']
+    budget_cfg = cfg.get('budget') or {}
+    ckpt_path = os.path.join(out_dir, 'checkpoint.json')
+    checkpoint = load_json(ckpt_path) if resume and os.path.exists(ckpt_path) else None
+    budget = None
+    if budget_cfg.get('enabled'):
+        budget = Budget(budget_cfg.get('max_cost_usd'), budget_cfg.get('max_tokens'), budget_cfg.get('prices'),
+                        spent=(checkpoint or {}).get('spent'))
     # provider
-    provider = get_provider(cfg.get('provider','openai'), **cfg)
+    with metrics.stage('provider_init'):
+        from llmeval.providers import transport
+        from llmeval.providers.coalesce import CoalescingProvider
+        transport.configure(**(cfg.get('http') or {}))  # pooled connections, rate limit, retries
+        make_provider = warm.provider if warm is not None else get_provider
+        provider = InstrumentedProvider(make_provider(cfg.get('provider','openai'), **cfg), metrics, budget=budget)
+        dedup = cfg.get('dedup') or {}
+        if dedup.get('enabled'):
+            provider = CoalescingProvider(provider, metrics, max_bytes=int(dedup.get('max_mb', 64) * 2**20))
     # rubric
-    import json
-    rubric = json.load(open(cfg['judge']['rubric'],'r'))
+    rubric = warm.rubric(cfg['judge']['rubric']) if warm is not None else json.load(open(cfg['judge']['rubric'],'r'))
     engine = JudgeEngine(provider, rubric)
+    # long prompts/answers are judged section by section and combined
+    long_cfg = dict(cfg['judge'].get('long_input') or {})
+    long_enabled = long_cfg.pop('enabled', False)
+    def pointwise_engine(e):
+        return MapReduceEngine(e, **long_cfg) if long_enabled else e
+    pointwise = pointwise_engine(engine)
+    long_engines = {'': pointwise}
+    cascade = None
+    cascade_cfg = dict(cfg['judge'].get('cascade') or {})
+    if cascade_cfg.pop('enabled', False):
+        cheap_name = cascade_cfg.pop('provider')
+        cheap_kwargs = cascade_cfg.pop('provider_args', {}) or {}
+        with metrics.stage('provider_init'):
+            cheap = InstrumentedProvider(make_provider(cheap_name, **{cheap_name: cheap_kwargs}), metrics,
+                                         prefix='cheap_', budget=budget)
+            if dedup.get('enabled'):
+                cheap = CoalescingProvider(cheap, metrics, max_bytes=int(dedup.get('max_mb', 64) * 2**20), prefix='cheap_')
+        long_engines['cheap_'] = pointwise_engine(JudgeEngine(cheap, rubric))
+        cascade = CascadeEngine(long_engines['cheap_'], pointwise, **cascade_cfg)
 
     # data
-    ds = {r['id']: r for r in load_jsonl(cfg['dataset_path'])}
-    gens = list(load_jsonl(cfg['generations_path']))
+    store_cfg = cfg.get('store') or {}
+    gens = list(generations) if generations is not None else None
+    with metrics.stage('load_data'):
+        if warm is not None:
+            ds = warm.dataset(cfg['dataset_path'])
+            n_dataset = len(ds)
+        elif store_cfg.get('enabled'):
+            # indexed SQLite copies, rebuilt only when the JSONL changes; only
+            # dataset rows referenced by a generation are read
+            opts = dict(cache_dir=store_cfg.get('cache_dir', '.llmeval_cache'), workers=store_cfg.get('workers'))
+            if gens is None:
+                gen_store = JsonlStore.for_source(cfg['generations_path'], **opts)
+                gens = list(gen_store)
+                gen_store.close()
+            ds_store = JsonlStore.for_source(cfg['dataset_path'], **opts)
+            found = ds_store.get_many(g['id'] for g in gens)
+            ds = {g['id']: found[str(g['id'])] for g in gens if str(g['id']) in found}
+            n_dataset = len(ds_store)
+            ds_store.close()
+        else:
+            ds = {r['id']: r for r in load_jsonl(cfg['dataset_path'])}
+            n_dataset = len(ds)
+        if gens is None:
+            gens = list(load_jsonl(cfg['generations_path']))
+    metrics.incr('rows.dataset', n_dataset)
+    metrics.incr('rows.generations', len(gens))
 
-    # optional anchor calibration
-    calib = {}
+    # optional anchor calibration, running in the background during scoring
+    calib, calib_future, anchors = {}, None, []
     anchors_path = cfg['judge'].get('anchors')
     if anchors_path and os.path.exists(anchors_path):
         anchors = list(load_jsonl(anchors_path))
-        calib = engine.calibrate(anchors)
+        # calibration spends from the same budget, so it stops with it
+        calib_future = engine.calibrate_async(anchors, **(cfg['judge'].get('calibration') or {}),
+                                              stop=(lambda: budget.exhausted) if budget is not None else None)
 
     out_rows = []
     models = set()
+    # config.yaml nests toxicity under metrics; older configs had it top-level
+    tox_cfg = cfg['metrics'].get('toxicity') or cfg.get('toxicity', {})
 
     # Precompute embeddings for references
-    if cfg['metrics']['relevance'].get('use_embeddings', True):
-        ref_texts = [ds[k]['reference'] for k in ds]
-        ref_embs = provider.embed(ref_texts)
-        ref_map = {k: ref_embs[i] for i,k in enumerate(ds.keys())}
-    else:
-        ref_map = {}
-
-    for g in tqdm(gens, desc="Scoring"):
-        _id = g['id']; output = g['output']; models.add(g.get('model','unknown'))
-        item = ds.get(_id, {}); prompt = item.get('prompt',''); ref = item.get('reference','')
-        # Relevance
-        out_emb = None
-        if cfg['metrics']['relevance'].get('use_embeddings', True):
-            out_emb = provider.embed([output])[0]
-        rel = relevance_scores(output, ref, out_emb, ref_map.get(_id), **cfg['metrics']['relevance'])
-        # Toxicity
-        tox = toxicity_lite(output, cfg['toxicity']['wordlist_path'])
-        # Self-consistency (if multiple samples provided)
-        sc = {}
-        if 'samples' in g:
-            sc = self_consistency([output]+g['samples'])
-        # LLM-as-a-Judge
-        judge_scores = {}
-        if cfg['judge']['mode'] == 'pointwise':
-            js = engine.score_pointwise(prompt, output)
-            judge_scores = js.get('scores', {})
-        row = {"id": _id, **rel, **tox, "judge_scores": judge_scores, **sc}
-        out_rows.append(row)
+    with metrics.stage('reference_embedding'):
+        if cfg['metrics']['relevance'].get('use_embeddings', True) and warm is not None:
+            ref_map = warm.reference_embeddings(provider, ds)
+        elif cfg['metrics']['relevance'].get('use_embeddings', True):
+            ref_texts = [ds[k]['reference'] for k in ds]
+            ref_embs = provider.embed(ref_texts)
+            ref_map = {k: ref_embs[i] for i,k in enumerate(ds.keys())}
+        else:
+            ref_map = {}
+
+    # Batch lexical metrics: references are tokenised once for all models
+    lex_scores = {}
+    lex_extra = list((cfg['metrics'].get('lexical') or {}).get('metrics', []))
+    if cfg['metrics']['relevance'].get('use_lexical', True) or lex_extra:
+        with metrics.stage('lexical'):
+            if warm is not None:
+                scorer = warm.lexical_scorer(cfg['dataset_path'])
+            else:
+                scorer = LexicalScorer()
+                scorer.add_references({k: v.get('reference', '') for k, v in ds.items()})
+            lex_scores = scorer.score([g['id'] for g in gens], [g['output'] for g in gens],
+                                      metrics=['f1'] + lex_extra,
+                                      batch_size=(cfg['metrics'].get('lexical') or {}).get('batch_size', 50_000))
+
+    # Local toxicity first: it is cheap and lets moderation skip decided items
+    with metrics.stage('toxicity'):
+        wordlist = tox_cfg.get('wordlist_path', 'prompts/toxicity_terms.txt')
+        tox_rows = [toxicity_lite(g['output'], wordlist) for g in gens]
+
+    # Adaptive sampling: stratified random order, stop once CIs are narrow enough
+    sampler = None
+    samp_cfg = dict(cfg.get('sampling') or {})
+    if samp_cfg.pop('enabled', False):
+        fields = samp_cfg.pop('strata', None)
+        sampler = AdaptiveSampler([stratum_key(ds.get(g['id'], {}), g, fields) for g in gens], **samp_cfg)
+    order = sampler.order if sampler else list(range(len(gens)))
+
+    # Budget: estimate up front; when it will not stretch to every row, score
+    # the most informative rows first so a capped run still says something
+    if budget is not None:
+        with metrics.stage('budget_estimate'):
+            est = estimate_run(cfg, ds, gens, rubric, anchors)
+        metrics.set_gauge('budget.estimate', est)
+        over = ((budget.max_cost_usd is not None and budget.cost_usd + est['cost_usd'] > budget.max_cost_usd)
+                or (budget.max_tokens is not None and budget.tokens + est['tokens'] > budget.max_tokens))
+        caps = [f"${budget.max_cost_usd}" if budget.max_cost_usd is not None else None,
+                f"{budget.max_tokens:,} tokens" if budget.max_tokens is not None else None]
+        print(f"Estimated cost ${est['cost_usd']:.4f} ({est['tokens']:,} tokens); "
+              f"cap: {', '.join(c for c in caps if c) or 'none'}")
+        if over and sampler is None:
+            print("Warning: the estimate exceeds the budget; scoring the most informative rows first.")
+            strata = [stratum_key(ds.get(g['id'], {}), g) for g in gens]
+            order = priority_order(strata, lex_scores['f1'] if lex_scores else None,
+                                   budget_cfg.get('priority', 'stratified'), budget_cfg.get('seed', 0))
+    # rows already scored before a budget stop are reused, not re-judged
+    prev_rows = []
+    if checkpoint is not None and os.path.exists(os.path.join(out_dir, 'summary.json')):
+        prev_rows = load_json(os.path.join(out_dir, 'summary.json'))
+        done = {(str(r['id']), r.get('model', 'unknown')) for r in prev_rows}
+        order = [i for i in order if (str(gens[i]['id']), gens[i].get('model', 'unknown')) not in done]
+        metrics.incr('budget.resumed_rows', len(prev_rows))
+    # rows are handed to background stages in chunks so sampling or the budget can stop early
+    chunk = sampler.check_every if sampler else 50 if budget is not None else max(len(gens), 1)
+
+    # Remote moderation runs in the background while rows are judged
+    moderation = None
+    if tox_cfg.get('enable_moderation') and getattr(provider, 'moderation', False):
+        moderation = ModerationStage(provider,
+                                     batch_size=tox_cfg.get('moderation_batch_size', 32),
+                                     local_first=tox_cfg.get('local_first', False),
+                                     toxic_min_hits=tox_cfg.get('local_toxic_min_hits', 2),
+                                     trust_clean=tox_cfg.get('local_trust_clean', False))
+
+    evaluated, budget_stop = [], False
+    with metrics.stage('scoring'):
+        for pos, i in enumerate(tqdm(order, desc="Scoring")):
+            if budget is not None and budget.exhausted:
+                budget_stop = True
+                break
+            g = gens[i]
+            if moderation is not None and pos % chunk == 0:
+                idx = order[pos:pos + chunk]
+                moderation.submit([gens[j]['output'] for j in idx], [tox_rows[j] for j in idx], keys=idx)
+            _id = g['id']; output = g['output']; models.add(g.get('model','unknown'))
+            item = ds.get(_id, {}); prompt = item.get('prompt',''); ref = item.get('reference','')
+            # Relevance
+            out_emb = None
+            if cfg['metrics']['relevance'].get('use_embeddings', True):
+                metrics.cache_lookup('reference_embedding', _id in ref_map)
+                with metrics.stage('scoring.output_embedding'):
+                    out_emb = provider.embed([output])[0]
+            with metrics.stage('scoring.relevance'):
+                rel = relevance_scores(output, ref, out_emb, ref_map.get(_id), lexical=lex_scores['f1'][i] if lex_scores else None,
+                                       **cfg['metrics']['relevance'])
+                rel.update({m: float(lex_scores[m][i]) for m in lex_extra})
+            # Toxicity
+            tox = tox_rows[i]
+            # Self-consistency (if multiple samples provided)
+            sc = {}
+            if 'samples' in g:
+                with metrics.stage('scoring.self_consistency'):
+                    sc = self_consistency([output]+g['samples'])
+            # LLM-as-a-Judge
+            judge_scores, judge_extra = {}, {}
+            if cfg['judge']['mode'] == 'pointwise':
+                with metrics.stage('scoring.judge'):
+                    if cascade is not None:
+                        js = cascade.score(prompt, output, rel)
+                        # skipped items keep the verdict their cheap metrics gave, and no judge scores
+                        judge_extra = {"judge_tier": js.get('judge_tier'), "metric_verdict": js.get('metric_verdict')}
+                    else:
+                        js = pointwise.score_pointwise(prompt, output)
+                judge_scores = js.get('scores', {})
+            row = {"id": _id, "model": g.get('model','unknown'), **rel, **tox, "judge_scores": judge_scores, **judge_extra, **sc}
+            out_rows.append(row)
+            evaluated.append(i)
+            if sampler is not None:
+                sampler.add(i, {"relevance_mean": rel.get('relevance'), "semantic_mean": rel.get('semantic'),
+                                "lex_f1_mean": rel.get('lexical_f1'), "tox_hits_mean": tox.get('toxic_hits'),
+                                "judge_rel_mean": to_float(judge_scores.get('relevance'))})
+                if sampler.should_stop():
+                    break
+
+    if calib_future is not None:
+        with metrics.stage('calibration_wait'):
+            calib = calib_future.result()
+        if not calib.get('cached'):
+            metrics.incr('calibration.trials', calib.get('trials') or 0)
+        if calib.get('errors'):
+            metrics.incr('calibration.errors', calib['errors'])
+            print(f"Warning: anchor calibration of judge {calib.get('judge')} stopped after an error "
+                  f"({calib.get('error')}); its result is incomplete.")
+        if calib.get('sprt_decision') == 'fail':
+            print(f"Warning: judge {calib.get('judge')} failed anchor calibration "
+                  f"(accuracy {calib.get('anchor_accuracy')}); judge scores may be unreliable.")
+
+    if moderation is not None:
+        with metrics.stage('moderation_wait'):
+            mod_rows = moderation.results()
+            for row, i in zip(out_rows, evaluated):
+                row.update(mod_rows.get(i, {}))
+        metrics.incr('moderation.local_decided', moderation.local_decided)
+        metrics.incr('moderation.errors', moderation.errors)
+        if moderation.errors:
+            print(f"Warning: {moderation.errors} moderation batch(es) failed ({moderation.last_error}); "
+                  "their rows have no moderation result.")
+    if prev_rows:
+        out_rows = prev_rows + out_rows
+        models.update(r.get('model', 'unknown') for r in prev_rows)
 
     # Aggregates
-    import pandas as pd, numpy as np
-    df = pd.DataFrame(out_rows)
-    # handle possibly missing columns
-    def colmean(series):
-        try:
-            return float(series.mean())
-        except Exception:
-            return None
-    agg = {
-        "relevance_mean": colmean(df.get('relevance', pd.Series(dtype=float))),
-        "semantic_mean": colmean(df.get('semantic', pd.Series(dtype=float))),
-        "lex_f1_mean": colmean(df.get('lexical_f1', pd.Series(dtype=float))),
-        "tox_hits_mean": colmean(df.get('toxic_hits', pd.Series(dtype=float))),
-        "judge_rel_mean": colmean(df.get('judge_scores', pd.Series([{}]*len(df))).map(lambda x: x.get('relevance',np.nan)) if 'judge_scores' in df else pd.Series(dtype=float)),
-        "anchor_acc": calib.get('anchor_accuracy')
-    }
-
-    os.makedirs(cfg['report']['out_dir'], exist_ok=True)
-    df.to_json(os.path.join(cfg['report']['out_dir'], 'summary.json'), orient='records', indent=2)
-    df.to_csv(os.path.join(cfg['report']['out_dir'], 'summary.csv'), index=False)
-    render_report(out_rows, agg, models, os.path.join(cfg['report']['out_dir'], 'report.html'))
-    print("Done. See reports in", cfg['report']['out_dir'])
+    with metrics.stage('dataframe'):
+        df = pd.DataFrame(out_rows)
+        # handle possibly missing columns
+        def colmean(series):
+            try:
+                return float(series.mean())
+            except Exception:
+                return None
+        agg = {
+            "relevance_mean": colmean(df.get('relevance', pd.Series(dtype=float))),
+            "semantic_mean": colmean(df.get('semantic', pd.Series(dtype=float))),
+            "lex_f1_mean": colmean(df.get('lexical_f1', pd.Series(dtype=float))),
+            "tox_hits_mean": colmean(df.get('toxic_hits', pd.Series(dtype=float))),
+            "judge_rel_mean": colmean(df.get('judge_scores', pd.Series([{}]*len(df))).map(lambda x: x.get('relevance',np.nan)) if 'judge_scores' in df else pd.Series(dtype=float)),
+            "anchor_acc": calib.get('anchor_accuracy'),
+            "anchor_position_bias": calib.get('position_bias'),
+        }
+        if cascade is not None:
+            cstats = cascade.stats()
+            for k, v in cstats.items():
+                metrics.set_gauge(f"cascade.{k}", v)
+            agg["judge_escalation_rate"] = cstats['escalation_rate']
+            agg["judge_skip_rate"] = cstats['skip_rate']
+            agg["judge_cascade_agreement"] = cstats['agreement']
+            # judge_rel_mean covers judged items only; rows settled by skip_rules are excluded
+            judged = df['judge_tier'] != 'skipped' if 'judge_tier' in df else pd.Series(dtype=bool)
+            agg["judge_coverage"] = float(judged.mean()) if len(judged) else None
+        if long_enabled:
+            for prefix, e in long_engines.items():
+                for k, v in e.stats().items():
+                    metrics.set_gauge(f"{prefix}long_input.{k}", v)
+        if moderation is not None:
+            agg["moderation_flag_rate"] = colmean(df.get('moderation_flagged', pd.Series(dtype=float)).dropna().astype(float))
+        for m in lex_extra:
+            agg[f"{m}_mean"] = colmean(df.get(m, pd.Series(dtype=float)))
+        if sampler is not None:
+            # stratified estimates replace plain means of the evaluated subset
+            for k, est in sampler.estimates().items():
+                agg[k] = est['mean']
+                agg[f"{k}_ci_width"] = est['width'] if math.isfinite(est['width']) else None
+                metrics.set_gauge(f"sampling.{k}", est)
+            agg["sample_fraction"] = sampler.fraction
+            metrics.set_gauge('sampling.rows', len(evaluated))
+            metrics.set_gauge('sampling.fraction', sampler.fraction)
+        if budget is not None:
+            spent = budget.snapshot()
+            metrics.set_gauge('budget.spent', spent)
+            agg["budget_cost_usd"] = spent['cost_usd']
+            agg["budget_tokens"] = spent['tokens']
+            if budget_stop:
+                agg["scored_fraction"] = len(out_rows) / len(gens) if gens else None
+
+    with metrics.stage('write_outputs'):
+        df.to_json(os.path.join(out_dir, 'summary.json'), orient='records', indent=2)
+        df.to_csv(os.path.join(out_dir, 'summary.csv'), index=False)
+        if budget_stop:
+            with open(ckpt_path, 'w', encoding='utf-8') as f:
+                json.dump({"reason": "budget", "rows_scored": len(out_rows), "rows_total": len(gens),
+                           "spent": budget.snapshot()}, f, indent=2)
+            print(f"Budget cap reached after {len(out_rows)}/{len(gens)} rows "
+                  f"(${budget.cost_usd:.4f}, {budget.tokens:,} tokens). Raise the cap and re-run with --resume.")
+        elif os.path.exists(ckpt_path):
+            os.remove(ckpt_path)
+    with metrics.stage('render_report'):
+        render_report(out_rows, agg, models, os.path.join(out_dir, 'report.html'))
+    return df, agg
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,165 @@
+"""Produce ``generations.jsonl`` by running dataset prompts through providers.
+
+    python -m llmeval.runners.generate --config config.yaml
+
+Every dataset prompt is sent to each model in the config's ``generation``
+block. Rows ``{"id", "model", "output", "samples"}`` are appended to the
+output file as they finish, and rows already in the file are skipped, so an
+interrupted run picks up where it stopped. ``samples`` holds the extra
+completions used by self-consistency; they come from the same request via the
+provider's ``n`` parameter where the API supports it.
+"""
+import argparse, inspect, json, os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llmeval.utils.profiling import RunMetrics, InstrumentedProvider
+from llmeval.providers import get_provider, provider_class
+
+def model_label(spec):
+    return spec.get('label') or spec.get('model') or spec['provider']
+
+def build_provider(spec, cfg, metrics):
+    """Provider for one ``generation.models`` entry.
+
+    Its ``model`` overrides the provider section where the provider takes a
+    model name; for ``generic``/``local`` it is only the output label.
+    """
+    name = spec['provider']
+    kwargs = dict(cfg.get(name) or {})
+    if spec.get('model') and 'model' in inspect.signature(provider_class(name)).parameters:
+        kwargs['model'] = spec['model']
+    return InstrumentedProvider(get_provider(name, **{name: kwargs}), metrics, prefix=f"{model_label(spec)}.")
+
+def completed(path):
+    """``(id, model)`` pairs already in ``path``.
+
+    An unterminated last line (a write cut off by a crash) is removed if it
+    does not parse. Other lines that do not parse are left in place, skipped
+    and reported.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    from llmeval.utils.common import json_loads
+    bad, size, last = [], 0, b''
+    with open(path, 'rb') as f:
+        for lineno, line in enumerate(f, 1):
+            size += len(line)
+            last = line
+            if not line.strip():
+                continue
+            try:
+                rec = json_loads(line)
+            except ValueError:
+                rec = None
+            if not isinstance(rec, dict):
+                bad.append(lineno)
+                continue
+            done.add((str(rec.get('id')), rec.get('model')))
+    if last and not last.endswith(b'\n'):
+        with open(path, 'r+b') as f:
+            if bad and bad[-1] == lineno:
+                bad.pop()
+                f.truncate(size - len(last))
+            else:
+                f.seek(0, os.SEEK_END)
+                f.write(b'\n')
+    if bad:
+        print(f"Warning: skipped {len(bad)} unreadable line(s) in {path} (line {', '.join(map(str, bad[:5]))}"
+              f"{', ...' if len(bad) > 5 else ''}); those rows will be generated again.")
+    return done
+
+def generate(cfg, metrics, out_path, limit=None):
+    """Append missing generations to ``out_path``; returns ``(written, failed)``."""
+    from tqdm import tqdm
+    from llmeval.utils.common import load_jsonl
+    gen_cfg = cfg.get('generation') or {}
+    specs = gen_cfg.get('models') or [{'provider': cfg.get('provider', 'openai')}]
+    samples = int(gen_cfg.get('samples', 0))
+    workers = max(1, int(gen_cfg.get('workers', 8)))
+    system = gen_cfg.get('system', '')
+    providers = [(model_label(s), build_provider(s, cfg, metrics), s.get('params') or {}) for s in specs]
+
+    done = completed(out_path)
+    metrics.incr('generate.resumed', len(done))
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+
+    def tasks():
+        for k, item in enumerate(load_jsonl(cfg['dataset_path'])):
+            if limit is not None and k >= limit:
+                return
+            for label, provider, params in providers:
+                if (str(item['id']), label) not in done:
+                    yield item, label, provider, params
+
+    def run(item, label, provider, params):
+        outs = provider.generate(item['prompt'], n=1 + samples, system=system, **params)
+        row = {"id": item['id'], "model": label, "output": outs[0] if outs else ""}
+        if samples:
+            row["samples"] = list(outs[1:])
+        return row
+
+    written, failed = 0, 0
+    pending = tasks()
+    with open(out_path, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=workers) as pool, \
+            tqdm(desc="Generating") as bar:
+        # bounded window: results stream to disk and memory stays flat on large datasets
+        inflight = {pool.submit(run, *t): t for _, t in zip(range(2 * workers), pending)}
+        while inflight:
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                item, label, _, _ = inflight.pop(fut)
+                try:
+                    row = fut.result()
+                except Exception as exc:
+                    failed += 1
+                    metrics.incr('generate.failed')
+                    print(f"Warning: {label} failed on {item['id']}: {exc}")
+                else:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    out.flush()
+                    written += 1
+                bar.update()
+            for t in pending:
+                inflight[pool.submit(run, *t)] = t
+                if len(inflight) >= 2 * workers:
+                    break
+    metrics.incr('generate.written', written)
+    return written, failed
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate model outputs for the dataset prompts")
+    ap.add_argument('--config', required=True)
+    ap.add_argument('--out', help='Output JSONL (default: generation.out_path, else <generations_path stem>.generated.jsonl)')
+    ap.add_argument('--samples', type=int, help='Extra samples per prompt for self-consistency')
+    ap.add_argument('--workers', type=int, help='Concurrent requests')
+    ap.add_argument('--limit', type=int, help='Only the first N dataset prompts')
+    args = ap.parse_args()
+    import yaml
+    from llmeval.providers import transport
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f) or {}
+    gen_cfg = cfg['generation'] = cfg.get('generation') or {}
+    for key in ('samples', 'workers'):
+        if getattr(args, key) is not None:
+            gen_cfg[key] = getattr(args, key)
+    out_path = args.out or gen_cfg.get('out_path')
+    if not out_path and cfg.get('generations_path'):
+        # never append to the generations file the config already evaluates
+        out_path = os.path.splitext(cfg['generations_path'])[0] + '.generated.jsonl'
+    if not out_path:
+        ap.error("no output path: pass --out or set generation.out_path")
+    if not os.path.exists(cfg.get('dataset_path') or ''):
+        ap.error(f"dataset_path '{cfg.get('dataset_path')}' not found")
+    transport.configure(**(cfg.get('http') or {}))
+
+    metrics = RunMetrics()
+    with metrics.stage('generate'):
+        written, failed = generate(cfg, metrics, out_path, limit=args.limit)
+    metrics.write(os.path.splitext(out_path)[0] + '.metrics.json')
+    print(f"Done. Wrote {written} rows to {out_path}" + (f"; {failed} failed (re-run to retry)" if failed else ""))
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""Pre-build the indexed stores used when ``store.enabled`` is set.
+
+    python -m llmeval.runners.ingest data/examples/qa.jsonl data/examples/generations.jsonl
+
+Stores are cached in ``--cache-dir`` and only rebuilt when a source changes,
+so running this again is cheap.
+"""
+import argparse, os, time
+from llmeval.utils.store import JsonlStore
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest JSONL files into indexed SQLite stores")
+    ap.add_argument('paths', nargs='+', help='Dataset or generations JSONL files')
+    ap.add_argument('--cache-dir', default='.llmeval_cache')
+    ap.add_argument('--workers', type=int, default=None, help='Parser processes for large files (default: CPU count)')
+    args = ap.parse_args()
+    for path in args.paths:
+        if not os.path.exists(path):
+            ap.error(f"'{path}' not found")
+    for path in args.paths:
+        t0 = time.perf_counter()
+        store = JsonlStore.for_source(path, cache_dir=args.cache_dir, workers=args.workers)
+        print(f"{path}: {len(store)} records -> {store.db_path} ({time.perf_counter() - t0:.2f}s)")
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""Long-running evaluation service.
+
+    python -m llmeval.runners.serve --config config.yaml --port 8766
+    python -m llmeval.runners.serve --config config.yaml --socket /tmp/llmeval.sock
+
+Keeps imports, providers (and their HTTP connections), rubrics, parsed
+datasets, reference embeddings, tokenised references, the toxicity lexicon
+and judge calibration in memory, so a small job only pays for its own
+scoring. Jobs run one at a time from a queue.
+
+    POST /jobs       {"config": {...overrides}, "generations": [...rows], "wait": true}
+    GET  /jobs/<id>  job status, aggregates and stage timings
+    GET  /health     queue length, jobs run and warm cache sizes
+
+``config`` is merged into the service's base config; only the keys in
+``JOB_OVERRIDES`` (judge mode, metric switches, sampling and budget limits)
+may be set, never providers, callables, paths or URLs. Without
+``generations`` the job reads ``generations_path``. Each job writes its
+reports to ``<base out_dir>/jobs/<id>``. POSTs must be
+``Content-Type: application/json`` without an ``Origin`` header, and with
+``--token`` every request needs ``Authorization: Bearer <token>``.
+"""
+import argparse, copy, hmac, json, os, queue, socketserver, threading, time, uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llmeval.utils.common import json_safe
+from llmeval.utils.profiling import RunMetrics
+from llmeval.providers import get_provider, unwrap
+from llmeval.runners.eval import run, validate_config
+
+def merge(base, override):
+    """Recursive dict merge; ``override`` wins."""
+    out = copy.deepcopy(base)
+    for k, v in (override or {}).items():
+        out[k] = merge(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+# The only config keys a job may override. Providers, callables, file paths,
+# URLs and output locations always come from the service's own config.
+JOB_OVERRIDES = {
+    'judge': {'mode': None},
+    'metrics': {
+        'relevance': {'use_embeddings': None, 'use_lexical': None},
+        'lexical': {'metrics': None},
+        'toxicity': {'enable_moderation': None, 'local_first': None, 'local_toxic_min_hits': None,
+                     'local_trust_clean': None},
+    },
+    'sampling': dict.fromkeys(['enabled', 'strata', 'ci_width', 'confidence', 'min_rows', 'check_every',
+                               'method', 'seed']),
+    'budget': dict.fromkeys(['enabled', 'max_cost_usd', 'max_tokens', 'priority']),
+}
+_UNSAFE_SUFFIXES = ('_path', '_dir', '_callable', '_url')
+
+def check_overrides(override, allowed=JOB_OVERRIDES, prefix=''):
+    """Names of keys in a job's ``config`` that jobs may not set."""
+    bad = []
+    for k, v in (override or {}).items():
+        name = f"{prefix}{k}"
+        if k not in allowed or str(k).endswith(_UNSAFE_SUFFIXES):
+            bad.append(name)
+        elif isinstance(allowed[k], dict):
+            bad += check_overrides(v, allowed[k], name + '.') if isinstance(v, dict) else [name]
+    return bad
+
+def _file_key(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+class WarmCache:
+    """Per-process state reused by ``eval.run`` across jobs.
+
+    Files are keyed by path, size and mtime so edits are picked up on the next
+    job; providers by their config section. At most ``max_embeddings``
+    reference embeddings are kept per provider (least recently used first out).
+    """
+
+    def __init__(self, max_embeddings=20_000):
+        self._lock = threading.RLock()
+        self.max_embeddings = max_embeddings
+        self._providers = {}
+        self._rubrics = {}
+        self._datasets = {}   # path -> (file key, {id: row})
+        self._scorers = {}    # path -> (file key, LexicalScorer)
+        self._embeddings = {}  # provider -> OrderedDict(reference text -> embedding)
+        self.hits = {"provider": 0, "rubric": 0, "dataset": 0, "lexical": 0, "reference_embedding": 0}
+        self.misses = dict.fromkeys(self.hits, 0)
+
+    def _count(self, name, hit, n=1):
+        (self.hits if hit else self.misses)[name] += n
+
+    def provider(self, name, **cfg):
+        key = (name, json.dumps(cfg.get(name) or {}, sort_keys=True, default=str))
+        with self._lock:
+            self._count("provider", key in self._providers)
+            if key not in self._providers:
+                self._providers[key] = get_provider(name, **cfg)
+            return self._providers[key]
+
+    def rubric(self, path):
+        key = _file_key(path)
+        with self._lock:
+            self._count("rubric", key in self._rubrics)
+            if key not in self._rubrics:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._rubrics[key] = json.load(f)
+            return self._rubrics[key]
+
+    def dataset(self, path):
+        from llmeval.utils.common import load_jsonl
+        key = _file_key(path)
+        with self._lock:
+            cached = self._datasets.get(path)
+            self._count("dataset", cached is not None and cached[0] == key)
+            if cached is None or cached[0] != key:
+                cached = self._datasets[path] = (key, {r['id']: r for r in load_jsonl(path)})
+            return cached[1]
+
+    def lexical_scorer(self, path):
+        from llmeval.metrics.lexical import LexicalScorer
+        key = _file_key(path)
+        with self._lock:
+            cached = self._scorers.get(path)
+            self._count("lexical", cached is not None and cached[0] == key)
+            if cached is None or cached[0] != key:
+                scorer = LexicalScorer()
+                scorer.add_references({k: v.get('reference', '') for k, v in self.dataset(path).items()})
+                cached = self._scorers[path] = (key, scorer)
+            return cached[1]
+
+    def reference_embeddings(self, provider, ds):
+        """``{id: embedding}`` for ``ds``; only references not embedded before are sent."""
+        raw = unwrap(provider)  # cache per underlying provider
+        with self._lock:
+            cache = self._embeddings.setdefault(raw, OrderedDict())
+            found = {}
+            for text in dict.fromkeys(r['reference'] for r in ds.values()):
+                if text in cache:
+                    cache.move_to_end(text)
+                    found[text] = cache[text]
+            missing = [t for t in dict.fromkeys(r['reference'] for r in ds.values()) if t not in found]
+            self._count("reference_embedding", True, len(ds) - len(missing))
+            self._count("reference_embedding", False, len(missing))
+            if missing:
+                found.update(zip(missing, provider.embed(missing)))
+                cache.update((t, found[t]) for t in missing)
+                while len(cache) > self.max_embeddings:
+                    cache.popitem(last=False)
+            return {k: found[r['reference']] for k, r in ds.items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "providers": len(self._providers), "datasets": len(self._datasets),
+                "reference_embeddings": sum(len(c) for c in self._embeddings.values()),
+                "hits": dict(self.hits), "misses": dict(self.misses),
+            }
+
+class EvalService:
+    """Job queue in front of ``eval.run`` with a shared ``WarmCache``."""
+
+    def __init__(self, base_cfg, keep_jobs=1000):
+        self.base_cfg = base_cfg
+        self.warm = WarmCache()
+        self.jobs = OrderedDict()
+        self.keep_jobs = keep_jobs
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.completed = 0
+        self.worker = threading.Thread(target=self._work, name="eval-worker", daemon=True)
+        self.worker.start()
+
+    def submit(self, payload):
+        """Queue a job; returns it, or raises ValueError for an invalid job."""
+        job_id = uuid.uuid4().hex[:12]
+        override = payload.get('config') or {}
+        if not isinstance(override, dict):
+            raise ValueError("'config' must be an object")
+        bad = check_overrides(override)
+        if bad:
+            raise ValueError(f"jobs may not override: {', '.join(bad)}")
+        cfg = merge(self.base_cfg, override)
+        cfg.setdefault('report', {})['out_dir'] = os.path.join(self.base_cfg['report']['out_dir'], 'jobs', job_id)
+        gens = payload.get('generations')
+        if gens is not None and not (isinstance(gens, list) and all(isinstance(g, dict) for g in gens)):
+            raise ValueError("'generations' must be a list of objects")
+        problems = validate_config(cfg)
+        if gens is not None:
+            problems = [p for p in problems if not p.startswith(('generations_path', "'generations_path'"))]
+        if problems:
+            raise ValueError("; ".join(problems))
+        job = {"id": job_id, "status": "queued", "submitted": time.time(), "cfg": cfg,
+               "generations": gens, "done": threading.Event()}
+        with self.lock:
+            self.jobs[job_id] = job
+            while len(self.jobs) > self.keep_jobs:
+                self.jobs.popitem(last=False)
+        self.queue.put(job)
+        return job
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            job["status"] = "running"
+            t0 = time.perf_counter()
+            metrics = RunMetrics()
+            try:
+                cfg = job.pop("cfg")
+                os.makedirs(cfg['report']['out_dir'], exist_ok=True)
+                df, agg = run(cfg, metrics, warm=self.warm, generations=job.pop("generations"))
+                metrics.write(os.path.join(cfg['report']['out_dir'], 'metrics.json'))
+                job.update(status="done", aggregates=agg, rows=len(df), out_dir=cfg['report']['out_dir'])
+            except Exception as exc:
+                job.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+            job["wall_s"] = time.perf_counter() - t0
+            job["stages"] = {k: v["wall_s"] for k, v in metrics.to_dict()["stages"].items()}
+            with self.lock:
+                self.completed += 1
+            job["done"].set()
+
+    def view(self, job):
+        return json_safe({k: v for k, v in job.items() if k not in ("done", "cfg", "generations")})
+
+    def health(self):
+        return {"status": "ok", "uptime_s": time.time() - self.started, "queued": self.queue.qsize(),
+                "completed": self.completed, "cache": self.warm.stats()}
+
+def make_handler(service, token=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _get(self):
+            path = self.path.rstrip("/")
+            if path == "/health":
+                self._send(200, service.health())
+            elif path.startswith("/jobs/"):
+                job = service.jobs.get(path[len("/jobs/"):])
+                self._send(200, service.view(job)) if job else self._send(404, {"error": "unknown job"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _authorized(self):
+            return not token or hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+        def do_GET(self):
+            if not self._authorized():
+                self._send(401, {"error": "missing or wrong bearer token"})
+                return
+            self._get()
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            if not self._authorized():
+                self._send(401, {"error": "missing or wrong bearer token"})
+                return
+            # browsers always send Origin on cross-site requests, and cannot send
+            # application/json cross-site without a preflight this server never answers
+            if self.headers.get("Origin"):
+                self._send(403, {"error": "cross-origin requests are not accepted"})
+                return
+            if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+                self._send(415, {"error": "Content-Type must be application/json"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                job = service.submit(payload)
+            except ValueError as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            if payload.get("wait"):
+                job["done"].wait(payload.get("timeout"))
+            self._send(200 if job["done"].is_set() or not payload.get("wait") else 202, service.view(job))
+
+    return Handler
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+def start_server(service, host="127.0.0.1", port=8766, socket_path=None, token=None):
+    """Start serving ``service`` on a background thread; returns the server.
+
+    With ``token`` every request needs ``Authorization: Bearer <token>``.
+    """
+    handler = make_handler(service, token)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve eval jobs from a warm process")
+    ap.add_argument('--config', required=True, help='Base config; jobs override parts of it')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8766)
+    ap.add_argument('--socket', help='Listen on this Unix socket instead of TCP')
+    ap.add_argument('--token', default=os.environ.get('LLMEVAL_SERVICE_TOKEN'),
+                    help='Require "Authorization: Bearer <token>" (default: $LLMEVAL_SERVICE_TOKEN)')
+    args = ap.parse_args()
+    import yaml
+    with open(args.config, 'r', encoding='utf-8') as f:
+        base_cfg = yaml.safe_load(f) or {}
+    if not (base_cfg.get('report') or {}).get('out_dir'):
+        ap.error("'report.out_dir' is not set")
+    service = EvalService(base_cfg)
+    server = start_server(service, args.host, args.port, args.socket, args.token)
+    print("Eval service listening on", args.socket or f"http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+"""Continuous evaluation of live traffic.
+
+    tail -F app/generations.jsonl | python -m llmeval.runners.stream --config config.yaml
+    python -m llmeval.runners.stream --config config.yaml --follow app/generations.jsonl
+
+Each input line is a generation row (``id``, ``output``, optional ``model``,
+``prompt`` and ``reference``); a missing prompt or reference is looked up in
+the dataset by ``id``. Rows are scored in micro-batches of up to
+``streaming.batch_size`` rows or ``streaming.max_wait_ms``, whichever comes
+first: one embedding request per batch and judge calls in parallel. Rolling
+means over the last ``streaming.window`` rows, overall and per model, go to
+``<out_dir>/stream_snapshots.jsonl`` every ``snapshot_every_s`` seconds, and
+``streaming.alerts`` thresholds are written to ``stream_alerts.jsonl`` (and
+stderr) when they start or stop firing. Memory stays bounded: the input
+queue, the window, the reference-embedding cache and the latency samples
+in ``RunMetrics`` all have fixed sizes, and repeated requests are not
+coalesced (``dedup`` is ignored).
+
+From Python, ``StreamEvaluator.run`` takes any iterable of rows or lines,
+e.g. ``iter_queue(q)`` over a ``queue.Queue`` fed by the application.
+"""
+import argparse, json, os, queue, random, sys, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from llmeval.utils.common import json_safe, to_float
+from llmeval.utils.profiling import RunMetrics, InstrumentedProvider, percentile
+from llmeval.providers import get_provider
+
+_END = object()
+
+def read_lines(f):
+    """Non-blank lines of an open file, as they arrive."""
+    for line in f:
+        if line.strip():
+            yield line
+
+def follow(path, poll_s=0.5, from_start=False, stop=None):
+    """Lines appended to ``path``, like ``tail -F``.
+
+    Starts at the end of the file unless ``from_start``. A partial last line
+    is held back until its newline arrives. When the file is truncated or
+    replaced (log rotation) it is reopened from the start. Runs until
+    ``stop`` (a ``threading.Event``) is set.
+    """
+    stop = stop or threading.Event()
+    f, ino, buf = None, None, b''
+    while not stop.is_set():
+        if f is None:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                stop.wait(poll_s)
+                continue
+            ino = os.fstat(f.fileno()).st_ino
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True  # later reopens are new files
+        chunk = f.readline()
+        if chunk:
+            buf += chunk
+            if buf.endswith(b'\n'):
+                line, buf = buf, b''
+                if line.strip():
+                    yield line
+            continue
+        try:
+            st = os.stat(path)
+            replaced = st.st_ino != ino or st.st_size < f.tell()
+        except FileNotFoundError:
+            replaced = False  # rotated away; wait for the new file
+        if replaced:
+            f.close()
+            f, buf = None, b''
+            continue
+        stop.wait(poll_s)
+    if f is not None:
+        f.close()
+
+def iter_queue(q, sentinel=None):
+    """Items from ``q`` until ``sentinel`` is put."""
+    while True:
+        item = q.get()
+        if item is sentinel:
+            return
+        yield item
+
+class StreamEvaluator:
+    """Scores rows in micro-batches and keeps rolling aggregates.
+
+    Reuses the offline metrics (``relevance_scores``, ``toxicity_lite``,
+    ``JudgeEngine``) with the same config sections as ``eval.run``, so online
+    and offline numbers are comparable.
+    """
+
+    def __init__(self, cfg, metrics, out_dir=None, alert_fn=None):
+        from llmeval.providers import transport
+        from llmeval.judge.engine import JudgeEngine
+        from llmeval.metrics.rolling import GroupedWindows
+        self.cfg = cfg
+        self.metrics = metrics
+        s = cfg.get('streaming') or {}
+        self.batch_size = max(1, int(s.get('batch_size', 32)))
+        self.max_wait_s = s.get('max_wait_ms', 200) / 1000.0
+        self.snapshot_every_s = s.get('snapshot_every_s', 10)
+        self.judge_rate = s.get('judge_rate', 1.0)
+        self.alert_rules = s.get('alerts') or {}
+        self.alert_min_rows = s.get('alert_min_rows', 50)
+        self.queue_size = s.get('queue_size', 10 * self.batch_size)
+        self.ref_cache_size = s.get('reference_cache_size', 10_000)
+        self.windows = GroupedWindows(s.get('window', 1000), s.get('window_seconds'), s.get('max_models', 50))
+        self.latencies = deque(maxlen=s.get('window', 1000))  # seconds from arrival to scored
+        self.rng = random.Random(s.get('seed', 0))
+        self.rel_cfg = cfg['metrics']['relevance']
+        tox_cfg = cfg['metrics'].get('toxicity') or cfg.get('toxicity', {})
+        self.wordlist = tox_cfg.get('wordlist_path', 'prompts/toxicity_terms.txt')
+        self.mode = cfg['judge'].get('mode', 'pointwise')
+
+        with metrics.stage('provider_init'):
+            transport.configure(**(cfg.get('http') or {}))
+            # no CoalescingProvider: repeats are rare in live traffic and a
+            # process that runs for days should not keep results around
+            provider = InstrumentedProvider(get_provider(cfg.get('provider', 'openai'), **cfg), metrics)
+        self.provider = provider
+        with open(cfg['judge']['rubric'], 'r', encoding='utf-8') as f:
+            self.engine = JudgeEngine(provider, json.load(f))
+        long_cfg = dict(cfg['judge'].get('long_input') or {})
+        if long_cfg.pop('enabled', False):
+            from llmeval.judge.longform import MapReduceEngine
+            self.engine = MapReduceEngine(self.engine, **long_cfg)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, int(s.get('judge_workers', 8))))
+        self._ds, self._ds_store = {}, None
+        if cfg.get('dataset_path') and os.path.exists(cfg['dataset_path']):
+            with metrics.stage('load_data'):
+                self._load_dataset(cfg)
+        self._ref_embs = OrderedDict()  # reference text -> embedding, LRU
+
+        self.out_dir = out_dir
+        self.rows_file = self.snap_file = self.alert_file = None
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            if s.get('write_rows', True):
+                self.rows_file = open(os.path.join(out_dir, 'stream_rows.jsonl'), 'a', encoding='utf-8')
+            self.snap_file = open(os.path.join(out_dir, 'stream_snapshots.jsonl'), 'a', encoding='utf-8')
+            self.alert_file = open(os.path.join(out_dir, 'stream_alerts.jsonl'), 'a', encoding='utf-8')
+        self.alert_fn = alert_fn or (lambda a: print("ALERT", json.dumps(a), file=sys.stderr, flush=True))
+        self.firing = {}
+        self.scored = 0
+        self._last_snapshot = time.monotonic()
+
+    def _load_dataset(self, cfg):
+        store_cfg = cfg.get('store') or {}
+        if store_cfg.get('enabled'):
+            # rows are fetched per batch from the indexed copy instead of held in memory
+            from llmeval.utils.store import JsonlStore
+            self._ds_store = JsonlStore.for_source(cfg['dataset_path'], cache_dir=store_cfg.get('cache_dir', '.llmeval_cache'),
+                                                   workers=store_cfg.get('workers'))
+        else:
+            from llmeval.utils.common import load_jsonl
+            self._ds = {str(r['id']): r for r in load_jsonl(cfg['dataset_path'])}
+
+    def _items(self, rows):
+        """``(prompt, reference)`` per row: inline fields first, then the dataset."""
+        ids = [str(r.get('id')) for r in rows]
+        if self._ds_store is not None:
+            found = self._ds_store.get_many(i for i, r in zip(ids, rows) if 'prompt' not in r or 'reference' not in r)
+        else:
+            found = self._ds
+        out = []
+        for i, r in zip(ids, rows):
+            item = found.get(i) or {}
+            out.append((r.get('prompt', item.get('prompt', '')), r.get('reference', item.get('reference', ''))))
+        return out
+
+    def _embed(self, outputs, refs):
+        """Output embeddings and reference embeddings in one request; references are cached."""
+        cache = self._ref_embs
+        missing = list(dict.fromkeys(r for r in refs if r and r not in cache))
+        for r in refs:
+            if r:
+                self.metrics.cache_lookup('reference_embedding', r not in missing)
+        with self.metrics.stage('stream.embedding'):
+            embs = self.provider.embed(list(outputs) + missing)
+        for text, e in zip(missing, embs[len(outputs):]):
+            cache[text] = e
+        ref_embs = []
+        for r in refs:
+            if r in cache:
+                cache.move_to_end(r)
+            ref_embs.append(cache.get(r))
+        while len(cache) > self.ref_cache_size:
+            cache.popitem(last=False)
+        return embs[:len(outputs)], ref_embs
+
+    def _judge(self, prompt, output):
+        try:
+            return self.engine.score_pointwise(prompt, output).get('scores', {})
+        except Exception:
+            self.metrics.incr('stream.judge_errors')
+            return None
+
+    def score_batch(self, rows):
+        """Scored rows for ``rows``, in the same shape as ``eval.run`` rows."""
+        from llmeval.metrics.relevance import relevance_scores
+        from llmeval.metrics.toxicity import toxicity_lite
+        items = self._items(rows)
+        outputs = [r.get('output') or '' for r in rows]
+        # judge calls start first and run while embeddings and local metrics are computed
+        futures = [None] * len(rows)
+        if self.mode == 'pointwise':
+            for k, ((prompt, _), out) in enumerate(zip(items, outputs)):
+                if self.judge_rate >= 1 or self.rng.random() < self.judge_rate:
+                    futures[k] = self.pool.submit(self._judge, prompt, out)
+        out_embs = ref_embs = [None] * len(rows)
+        if self.rel_cfg.get('use_embeddings', True):
+            try:
+                out_embs, ref_embs = self._embed(outputs, [ref for _, ref in items])
+            except Exception:
+                self.metrics.incr('stream.embed_errors')  # fall back to lexical relevance for this batch
+        scored = []
+        with self.metrics.stage('stream.local_metrics'):
+            for k, r in enumerate(rows):
+                ref = items[k][1]
+                rel = relevance_scores(outputs[k], ref, out_embs[k], ref_embs[k], **self.rel_cfg) if ref else {}
+                if not ref:
+                    self.metrics.incr('stream.no_reference')
+                scored.append({"id": r.get('id'), "model": r.get('model', 'unknown'), **rel,
+                               **toxicity_lite(outputs[k], self.wordlist), "judge_scores": {}})
+        with self.metrics.stage('stream.judge_wait'):
+            for row, fut in zip(scored, futures):
+                js = fut.result() if fut is not None else None
+                if js is not None:
+                    row["judge_scores"] = js
+        return scored
+
+    def _observe(self, row, arrived):
+        now = time.monotonic()
+        self.latencies.append(now - arrived)
+        self.windows.add(row['model'], {
+            "relevance_mean": row.get('relevance'), "semantic_mean": row.get('semantic'),
+            "lex_f1_mean": row.get('lexical_f1'), "tox_hits_mean": row.get('toxic_hits'),
+            "judge_rel_mean": to_float(row['judge_scores'].get('relevance')),
+        }, now)
+
+    def snapshot(self):
+        snap = self.windows.snapshot()
+        lat = list(self.latencies)
+        return {"ts": time.time(), "rows_total": self.scored, **snap,
+                "latency_p50_s": percentile(lat, 50), "latency_p95_s": percentile(lat, 95)}
+
+    def check_alerts(self, snap):
+        """Alerts for thresholds that started or stopped firing since the last check."""
+        from llmeval.metrics.rolling import breached
+        now = {} if snap['n'] < self.alert_min_rows else {b['metric']: b for b in breached(snap, self.alert_rules)}
+        events = []
+        for metric, b in now.items():
+            if metric not in self.firing:
+                events.append({"ts": snap['ts'], "state": "firing", "window_rows": snap['n'], **b})
+        for metric, b in self.firing.items():
+            if metric not in now:
+                events.append({"ts": snap['ts'], "state": "resolved", "metric": metric,
+                               "value": snap.get(metric), "window_rows": snap['n']})
+        self.firing = now
+        return events
+
+    def _write(self, f, rec):
+        if f is not None:
+            f.write(json.dumps(json_safe(rec)) + "\n")
+            f.flush()
+
+    def _tick(self, force=False):
+        if not force and time.monotonic() - self._last_snapshot < self.snapshot_every_s:
+            return
+        self._last_snapshot = time.monotonic()
+        snap = self.snapshot()
+        self._write(self.snap_file, snap)
+        for event in self.check_alerts(snap):
+            self.metrics.incr('stream.alerts')
+            self._write(self.alert_file, event)
+            self.alert_fn(event)
+        return snap
+
+    def process(self, batch):
+        """Score ``[(arrival time, row)]`` and fold the results into the window."""
+        with self.metrics.stage('stream.batch'):
+            scored = self.score_batch([r for _, r in batch])
+        for (arrived, _), row in zip(batch, scored):
+            self._observe(row, arrived)
+            self._write(self.rows_file, row)
+        self.scored += len(scored)
+        self.metrics.incr('stream.rows', len(scored))
+        self.metrics.incr('stream.batches')
+
+    def run(self, source):
+        """Consume ``source`` (rows or JSON lines) until it ends; returns the last snapshot."""
+        from llmeval.utils.common import json_loads
+        q = queue.Queue(maxsize=self.queue_size)  # a slow scorer blocks the reader instead of buffering
+        failure = []
+
+        def reader():
+            try:
+                for item in source:
+                    if isinstance(item, (str, bytes)):
+                        try:
+                            item = json_loads(item)
+                        except ValueError:
+                            self.metrics.incr('stream.bad_lines')
+                            continue
+                    if not isinstance(item, dict) or 'output' not in item:
+                        self.metrics.incr('stream.bad_lines')
+                        continue
+                    q.put((time.monotonic(), item))
+            except Exception as exc:
+                failure.append(exc)
+            finally:
+                q.put(_END)
+
+        threading.Thread(target=reader, name="stream-reader", daemon=True).start()
+        ended = False
+        while not ended:
+            try:
+                first = q.get(timeout=max(0.05, self.snapshot_every_s - (time.monotonic() - self._last_snapshot)))
+            except queue.Empty:
+                self._tick()
+                continue
+            if first is _END:
+                break
+            batch, deadline = [first], time.monotonic() + self.max_wait_s
+            while len(batch) < self.batch_size:
+                try:
+                    item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _END:
+                    ended = True
+                    break
+                batch.append(item)
+            self.process(batch)
+            self._tick()
+        if failure:
+            raise failure[0]
+        return self._tick(force=True)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self._ds_store is not None:
+            self._ds_store.close()
+        for f in (self.rows_file, self.snap_file, self.alert_file):
+            if f is not None:
+                f.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Score a live stream of generations")
+    ap.add_argument('--config', required=True)
+    ap.add_argument('--follow', help='Tail this JSONL file instead of reading stdin')
+    ap.add_argument('--from-start', action='store_true', help='With --follow, read the existing lines first')
+    ap.add_argument('--out-dir', help='Where snapshots and alerts go (default: report.out_dir)')
+    args = ap.parse_args()
+    import yaml
+    with open(args.config, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f) or {}
+    out_dir = args.out_dir or (cfg.get('report') or {}).get('out_dir')
+    if not out_dir:
+        ap.error("'report.out_dir' is not set")
+    metrics = RunMetrics()
+    evaluator = StreamEvaluator(cfg, metrics, out_dir=out_dir)
+    stop = threading.Event()
+    source = (follow(args.follow, from_start=args.from_start, stop=stop) if args.follow
+              else read_lines(sys.stdin.buffer))
+    try:
+        snap = evaluator.run(source)
+        print(json.dumps({k: v for k, v in snap.items() if k != 'groups'}, default=str))
+    except KeyboardInterrupt:
+        stop.set()
+        evaluator._tick(force=True)
+    finally:
+        evaluator.close()
+        metrics.write(os.path.join(out_dir, 'stream_metrics.json'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Token/cost estimation before a run and a hard spending cap during it.
+
+Prices are USD per million tokens, per model, e.g.
+``{"gpt-4o-mini": {"input": 0.15, "output": 0.60}}``; unpriced models are
+counted in tokens only.
+"""
+import math, random, threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+try:  # optional: exact counts for OpenAI models; otherwise ~4 characters per token
+    import tiktoken as _tiktoken
+except ImportError:
+    _tiktoken = None
+
+@lru_cache(maxsize=None)
+def _encoder(model: str):
+    if _tiktoken is None:
+        return None
+    try:
+        return _tiktoken.encoding_for_model(model)
+    except KeyError:
+        return _tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "") -> int:
+    if not text:
+        return 0
+    enc = _encoder(model or "")
+    if enc is None:
+        return math.ceil(len(text) / 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+def cost_of(prices: Dict[str, dict], model: str, input_tokens: float, output_tokens: float = 0) -> float:
+    p = prices.get(model) or {}
+    return (input_tokens * p.get("input", 0.0) + output_tokens * p.get("output", 0.0)) / 1e6
+
+class Budget:
+    """Live token and cost totals with optional hard caps; thread-safe.
+
+    ``charge`` is called with each response's ``usage`` block. ``exhausted``
+    turns true once either cap is reached; the runner checks it between rows,
+    so the overshoot is at most the calls already in flight.
+    """
+
+    def __init__(self, max_cost_usd: Optional[float] = None, max_tokens: Optional[int] = None,
+                 prices: Optional[Dict[str, dict]] = None, spent: Optional[dict] = None):
+        self.max_cost_usd = max_cost_usd
+        self.max_tokens = max_tokens
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        spent = spent or {}
+        self.cost_usd = float(spent.get("cost_usd", 0.0))
+        self.tokens = int(spent.get("tokens", 0))
+        self.by_model: Dict[str, dict] = {k: dict(v) for k, v in (spent.get("by_model") or {}).items()}
+
+    def charge(self, model: str, usage: dict):
+        inp = int(usage.get("prompt_tokens") or 0)
+        out = int(usage.get("completion_tokens") or 0)
+        if not inp and not out:
+            inp = int(usage.get("total_tokens") or 0)  # embeddings report a total only
+        cost = cost_of(self.prices, model, inp, out)
+        with self._lock:
+            m = self.by_model.setdefault(model, {"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0})
+            m["input_tokens"] += inp
+            m["output_tokens"] += out
+            m["cost_usd"] += cost
+            self.tokens += inp + out
+            self.cost_usd += cost
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return ((self.max_cost_usd is not None and self.cost_usd >= self.max_cost_usd)
+                    or (self.max_tokens is not None and self.tokens >= self.max_tokens))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"cost_usd": self.cost_usd, "tokens": self.tokens,
+                    "by_model": {k: dict(v) for k, v in self.by_model.items()},
+                    "max_cost_usd": self.max_cost_usd, "max_tokens": self.max_tokens}
+
+def estimate_run(cfg: dict, ds: dict, gens: List[dict], rubric: dict, anchors=(), sample: int = 2000, seed: int = 0) -> dict:
+    """Expected tokens and cost of ``eval.run`` for ``cfg``, by model.
+
+    Judge prompts are built exactly as the runner builds them and tokenised
+    locally; completions are assumed to be ``budget.judge_output_tokens``
+    long. Above ``sample`` generations a random sample is tokenised and
+    scaled up.
+    """
+    from llmeval.judge.prompts import build_pointwise_prompt, build_pairwise_prompt
+    bcfg = cfg.get("budget") or {}
+    prices = bcfg.get("prices") or {}
+    out_tokens = bcfg.get("judge_output_tokens", 150)
+    pcfg = cfg.get(cfg.get("provider", "openai")) or {}
+    judge_model = pcfg.get("model") or cfg.get("provider", "openai")
+    embed_model = pcfg.get("embedding_model") or judge_model
+    system = rubric.get("system", "")
+    rows = gens if len(gens) <= sample else random.Random(seed).sample(gens, sample)
+    scale = len(gens) / len(rows) if rows else 0.0
+    totals: Dict[str, dict] = {}
+
+    def add(model, inp, out=0.0, calls=0.0):
+        t = totals.setdefault(model, {"input_tokens": 0.0, "output_tokens": 0.0, "calls": 0.0})
+        t["input_tokens"] += inp
+        t["output_tokens"] += out
+        t["calls"] += calls
+
+    if cfg["metrics"]["relevance"].get("use_embeddings", True):
+        add(embed_model, sum(count_tokens(r.get("reference", ""), embed_model) for r in ds.values()), calls=1)
+        add(embed_model, scale * sum(count_tokens(g.get("output", ""), embed_model) for g in rows), calls=len(gens))
+    if cfg["judge"].get("mode", "pointwise") == "pointwise":
+        cascade = cfg["judge"].get("cascade") or {}
+        judges = [(judge_model, 1.0, False)]
+        if cascade.get("enabled"):
+            cheap_model = (cascade.get("provider_args") or {}).get("model") or cascade.get("provider")
+            judges = [(cheap_model, 1.0, True), (judge_model, bcfg.get("expected_escalation_rate", 0.3), False)]
+        for model, share, conf in judges:
+            inp = sum(count_tokens(system, model) + count_tokens(build_pointwise_prompt(
+                ds.get(g["id"], {}).get("prompt", ""), g.get("output", ""), rubric, ask_confidence=conf), model)
+                for g in rows)
+            add(model, scale * share * inp, scale * share * len(rows) * out_tokens, share * len(gens))
+    for a in anchors:  # calibration upper bound: every anchor in both orders
+        for first, second in ((a["good"], a["bad"]), (a["bad"], a["good"])):
+            add(judge_model, count_tokens(system, judge_model)
+                + count_tokens(build_pairwise_prompt(a["prompt"], first, second, rubric), judge_model), out_tokens, 1)
+
+    by_model = {m: {**{k: round(v) for k, v in t.items()},
+                    "cost_usd": cost_of(prices, m, t["input_tokens"], t["output_tokens"])}
+                for m, t in totals.items()}
+    return {
+        "rows": len(gens), "sampled_rows": len(rows), "tokenizer": "tiktoken" if _tiktoken else "chars/4",
+        "by_model": by_model,
+        "tokens": sum(t["input_tokens"] + t["output_tokens"] for t in by_model.values()),
+        "cost_usd": sum(t["cost_usd"] for t in by_model.values()),
+        "unpriced_models": sorted(m for m in by_model if m not in prices),
+    }
+
+def priority_order(strata: List[str], lexical: Optional[List[float]] = None,
+                   mode: str = "stratified", seed: int = 0) -> List[int]:
+    """Row order for a run that may be cut short by the budget.
+
+    ``stratified`` (default) keeps every prefix a proportional random sample
+    of the strata, so partial aggregates stay unbiased. ``uncertain`` puts
+    rows whose lexical F1 is closest to 0.5 first, where cheap metrics say
+    least about the judge's verdict, taking turns across strata so each
+    stays covered.
+    """
+    from llmeval.metrics.sampling import stratified_order
+    if mode != "uncertain" or lexical is None:
+        return stratified_order(strata, seed)
+    by_stratum: Dict[str, List[int]] = {}
+    for i, s in enumerate(strata):
+        by_stratum.setdefault(s, []).append(i)
+    queues = [sorted(idx, key=lambda i: abs(lexical[i] - 0.5) if lexical[i] == lexical[i] else 1.0)
+              for idx in by_stratum.values()]
+    order = []
+    for rank in range(max(map(len, queues), default=0)):
+        order.extend(q[rank] for q in queues if rank < len(q))
+    return order
@@ -1,13 +1,44 @@
-import json, os, math, numpy as np, pandas as pd, re
-from typing import List, Dict
+import json, os, math
+
+try:  # optional: orjson parses several times faster than the stdlib
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+def json_loads(data):
+    return _orjson.loads(data) if _orjson is not None else json.loads(data)
+
+def load_json(path):
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
 
 def load_jsonl(path):
     with open(path, 'r', encoding='utf-8') as f:
         for line in f:
             if line.strip():
-                yield json.loads(line)
+                yield json_loads(line)
+
+def to_float(v):
+    """``float(v)``, or None when ``v`` is not a number (e.g. a missing judge score)."""
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def json_safe(x):
+    """JSON-safe copy: NaN/inf become null, numpy scalars become Python numbers."""
+    if isinstance(x, dict):
+        return {str(k): json_safe(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [json_safe(v) for v in x]
+    if hasattr(x, 'item') and not isinstance(x, (str, bytes)):
+        x = x.item()
+    if isinstance(x, float) and not math.isfinite(x):
+        return None
+    return x
 
 def cosine(a, b):
+    import numpy as np  # not at module level: the CLIs import this module for --help
     a = np.array(a); b = np.array(b)
     denom = (np.linalg.norm(a)*np.linalg.norm(b))
     return float(np.dot(a,b)/denom) if denom else 0.0
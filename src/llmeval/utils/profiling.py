@@ -0,0 +1,192 @@
+import json, time, threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (``q`` in 0-100) of ``values``."""
+    if not values:
+        return None
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+class RunMetrics:
+    """Collects per-stage timings, provider latencies and counters for a run.
+
+    Stages accumulate, so timing the same stage once per row yields the total
+    time spent in it across the run. Recording is thread-safe so concurrent
+    provider calls can share one instance. Latency counts, means and maxima
+    cover every call; percentiles cover the last ``latency_samples`` calls per
+    key, so long-running processes use bounded memory.
+    """
+
+    def __init__(self, latency_samples: int = 10_000):
+        self._lock = threading.Lock()
+        self.latency_samples = latency_samples
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.latencies: Dict[str, deque] = {}
+        self._latency_totals: Dict[str, List[float]] = {}  # [count, sum, max]
+        self.counters: Dict[str, int] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.gauges: Dict[str, Any] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            with self._lock:
+                st = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+                st["wall_s"] += wall
+                st["cpu_s"] += cpu
+                st["calls"] += 1
+
+    def record_latency(self, key: str, seconds: float):
+        with self._lock:
+            xs = self.latencies.get(key)
+            if xs is None:
+                xs = self.latencies[key] = deque(maxlen=self.latency_samples)
+                self._latency_totals[key] = [0, 0.0, 0.0]
+            xs.append(seconds)
+            tot = self._latency_totals[key]
+            tot[0] += 1
+            tot[1] += seconds
+            tot[2] = max(tot[2], seconds)
+
+    def incr(self, key: str, n: int = 1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def set_gauge(self, key: str, value):
+        with self._lock:
+            self.gauges[key] = value
+
+    def cache_lookup(self, name: str, hit: bool):
+        with self._lock:
+            c = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            c["hits" if hit else "misses"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = {}
+            for key, xs in self.latencies.items():
+                n, total, peak = self._latency_totals[key]
+                lat[key] = {
+                    "count": n,
+                    "mean_s": total / n,
+                    "p50_s": percentile(xs, 50),
+                    "p95_s": percentile(xs, 95),
+                    "p99_s": percentile(xs, 99),
+                    "max_s": peak,
+                }
+            cache = {}
+            for name, c in self.cache.items():
+                total = c["hits"] + c["misses"]
+                cache[name] = {**c, "hit_rate": c["hits"] / total if total else None}
+            return {
+                "total_wall_s": time.perf_counter() - self._t0,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "provider_latency": lat,
+                "counters": dict(self.counters),
+                "cache": cache,
+                "gauges": dict(self.gauges),
+            }
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class InstrumentedProvider:
+    """Wraps a provider and records latency and request/token counts.
+
+    Token counts are taken from ``provider.last_usage`` when the provider
+    exposes one (OpenAI-compatible ``usage`` blocks); other providers only
+    contribute request and text counts. With a ``budget`` the usage is also
+    charged to it, priced by the model that served the call.
+    """
+
+    def __init__(self, provider, metrics: RunMetrics, prefix: str = "", budget=None):
+        self.provider = provider
+        self.metrics = metrics
+        self.prefix = prefix
+        self.budget = budget
+
+    def model_for(self, op: str) -> str:
+        p = self.provider
+        name = getattr(p, "embedding_model" if op == "embed" else "model", None)
+        return name or type(p).__name__
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def _call(self, op: str, fn, *args, n_texts: int = 1):
+        m = self.metrics
+        model = self.model_for(op)
+        op = self.prefix + op
+        if hasattr(self.provider, "last_usage"):
+            self.provider.last_usage = None  # per-thread; a call without usage must not reuse the last one
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception:
+            m.incr(f"{op}.errors")
+            raise
+        finally:
+            m.record_latency(op, time.perf_counter() - t0)
+            m.incr(f"{op}.requests")
+            m.incr(f"{op}.texts", n_texts)
+            usage = getattr(self.provider, "last_usage", None) or {}
+            for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                if usage.get(k):
+                    m.incr(f"{op}.{k}", int(usage[k]))
+            if usage and self.budget is not None:
+                self.budget.charge(model, usage)
+
+    def judge(self, prompt, rubric_json):
+        return self._call("judge", self.provider.judge, prompt, rubric_json)
+
+    def embed(self, texts):
+        return self._call("embed", self.provider.embed, texts, n_texts=len(texts))
+
+    def generate(self, prompt, n=1, **params):
+        return self._call("generate", lambda p: self.provider.generate(p, n=n, **params), prompt, n_texts=n)
+
+    def moderate(self, text):
+        return self._call("moderate", self.provider.moderate, text)
+
+    def moderate_batch(self, texts):
+        fn = getattr(self.provider, "moderate_batch", None) or (lambda ts: [self.provider.moderate(t) for t in ts])
+        return self._call("moderate", fn, texts, n_texts=len(texts))
+
+
+@contextmanager
+def maybe_profile(out_path: Optional[str]):
+    """Run the enclosed block under cProfile when ``out_path`` is given.
+
+    Writes the raw stats to ``out_path`` (loadable with ``pstats`` or
+    snakeviz) and a text summary of the top cumulative entries next to it.
+    """
+    if not out_path:
+        yield
+        return
+    import cProfile, pstats, io
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(out_path)
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(40)
+        with open(out_path.rsplit(".", 1)[0] + ".txt", "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
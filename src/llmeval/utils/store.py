@@ -0,0 +1,132 @@
+"""Indexed on-disk store for dataset and generation JSONL files.
+
+Ingestion parses the JSONL once (in parallel byte-range chunks for large
+files) into SQLite with an index on ``id``, keeping each record's original
+JSON text. The store is cached next to other llmeval artifacts and rebuilt
+only when the source file's size or mtime changes.
+"""
+import hashlib, os, sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional
+from .common import json_loads
+
+SCHEMA_VERSION = "1"
+
+def _parse_range(path: str, start: int, end: int):
+    """Parse the lines whose first byte lies in ``[start, end)``."""
+    out = []
+    with open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            if f.read(1) != b'\n':
+                f.readline()  # finish the line owned by the previous chunk
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                rec = json_loads(line)
+                out.append((str(rec.get('id')), rec.get('model'), line.decode('utf-8').rstrip('\n')))
+    return out
+
+def _chunks(path: str, chunk_bytes: int):
+    size = os.path.getsize(path)
+    return [(s, min(s + chunk_bytes, size)) for s in range(0, size, chunk_bytes)] or [(0, 0)]
+
+def ingest_jsonl(src: str, db_path: str, workers: Optional[int] = None, chunk_bytes: int = 32 << 20):
+    """(Re)build ``db_path`` from ``src``; returns the number of records."""
+    st = os.stat(src)
+    tmp = db_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    con.executescript("""
+        PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE records (seq INTEGER PRIMARY KEY, id TEXT NOT NULL, model TEXT, body TEXT NOT NULL);
+    """)
+    ranges = _chunks(src, chunk_bytes)
+    n = 0
+    if len(ranges) > 1 and workers != 1:
+        from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_parse_range, [src] * len(ranges), *zip(*ranges))
+            for part in parts:  # map preserves file order
+                con.executemany("INSERT INTO records (id, model, body) VALUES (?, ?, ?)", part)
+                n += len(part)
+    else:
+        for start, end in ranges:
+            part = _parse_range(src, start, end)
+            con.executemany("INSERT INTO records (id, model, body) VALUES (?, ?, ?)", part)
+            n += len(part)
+    con.execute("CREATE INDEX records_id ON records (id, model)")
+    con.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("schema", SCHEMA_VERSION), ("source", os.path.abspath(src)),
+        ("size", str(st.st_size)), ("mtime_ns", str(st.st_mtime_ns)), ("count", str(n)),
+    ])
+    con.commit()
+    con.close()
+    os.replace(tmp, db_path)
+    return n
+
+class JsonlStore:
+    """Read access to an ingested JSONL file, looked up by ``id``."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.con = sqlite3.connect(db_path, check_same_thread=False)
+
+    @classmethod
+    def for_source(cls, src: str, cache_dir: str = '.llmeval_cache', workers: Optional[int] = None) -> "JsonlStore":
+        """Open the cached store for ``src``, ingesting it first if missing or stale."""
+        os.makedirs(cache_dir, exist_ok=True)
+        tag = hashlib.sha1(os.path.abspath(src).encode('utf-8')).hexdigest()[:12]
+        db_path = os.path.join(cache_dir, f"{os.path.basename(src)}.{tag}.sqlite")
+        if not cls.is_fresh(db_path, src):
+            ingest_jsonl(src, db_path, workers=workers)
+        return cls(db_path)
+
+    @staticmethod
+    def is_fresh(db_path: str, src: str) -> bool:
+        if not os.path.exists(db_path):
+            return False
+        st = os.stat(src)
+        try:
+            con = sqlite3.connect(db_path)
+            meta = dict(con.execute("SELECT key, value FROM meta"))
+            con.close()
+        except sqlite3.DatabaseError:
+            return False
+        return (meta.get("schema") == SCHEMA_VERSION and meta.get("size") == str(st.st_size)
+                and meta.get("mtime_ns") == str(st.st_mtime_ns))
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __contains__(self, _id):
+        return self.con.execute("SELECT 1 FROM records WHERE id = ? LIMIT 1", (str(_id),)).fetchone() is not None
+
+    def get(self, _id, default=None):
+        row = self.con.execute("SELECT body FROM records WHERE id = ? ORDER BY seq LIMIT 1", (str(_id),)).fetchone()
+        return json_loads(row[0]) if row else default
+
+    def get_many(self, ids: Iterable) -> Dict[str, dict]:
+        """``{id: record}`` for the requested IDs (first record wins), via the index."""
+        out: Dict[str, dict] = {}
+        keys: List[str] = list(dict.fromkeys(str(i) for i in ids))
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            q = f"SELECT id, body FROM records WHERE id IN ({','.join('?' * len(part))}) ORDER BY seq"
+            for _id, body in self.con.execute(q, part):
+                if _id not in out:
+                    out[_id] = json_loads(body)
+        return out
+
+    def ids(self) -> List[str]:
+        return [r[0] for r in self.con.execute("SELECT DISTINCT id FROM records")]
+
+    def __iter__(self) -> Iterator[dict]:
+        for (body,) in self.con.execute("SELECT body FROM records ORDER BY seq"):
+            yield json_loads(body)
+
+    def close(self):
+        self.con.close()
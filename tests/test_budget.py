@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from llmeval.judge.prompts import build_pointwise_prompt
+from llmeval.utils.budget import Budget, cost_of, count_tokens, estimate_run, priority_order
+
+PRICES = {"judge": {"input": 1.0, "output": 2.0}, "embed": {"input": 0.5}}
+RUBRIC = {"criteria": [{"key": "relevance", "desc": "On topic?", "scale": [0, 1, 2]}]}
+
+
+def test_cost_of():
+    assert cost_of(PRICES, "judge", 1_000_000, 500_000) == pytest.approx(2.0)
+    assert cost_of(PRICES, "unpriced", 1_000_000, 1_000_000) == 0.0
+
+
+def test_charge_and_caps():
+    b = Budget(max_cost_usd=3.0, prices=PRICES)
+    b.charge("judge", {"prompt_tokens": 1_000_000, "completion_tokens": 500_000})
+    assert b.cost_usd == pytest.approx(2.0) and b.tokens == 1_500_000
+    assert not b.exhausted
+    b.charge("embed", {"total_tokens": 2_000_000})  # embeddings report a total only
+    assert b.by_model["embed"]["input_tokens"] == 2_000_000
+    assert b.exhausted
+    assert Budget(max_tokens=10).exhausted is False
+
+
+def test_resume_from_snapshot():
+    b = Budget(max_tokens=100, prices=PRICES)
+    b.charge("judge", {"prompt_tokens": 60, "completion_tokens": 0})
+    resumed = Budget(max_tokens=100, prices=PRICES, spent=b.snapshot())
+    resumed.charge("judge", {"prompt_tokens": 40})
+    assert resumed.tokens == 100 and resumed.exhausted
+    assert resumed.by_model["judge"]["input_tokens"] == 100
+    assert b.by_model["judge"]["input_tokens"] == 60  # the snapshot is a copy
+
+
+def test_charge_is_thread_safe():
+    b = Budget(prices=PRICES)
+    def work():
+        for _ in range(1000):
+            b.charge("judge", {"prompt_tokens": 1, "completion_tokens": 1})
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert b.tokens == 16_000
+    assert b.cost_usd == pytest.approx(8000 * 3.0 / 1e6)
+
+
+def _cfg(**judge):
+    return {
+        "provider": "openai",
+        "openai": {"model": "judge", "embedding_model": "embed"},
+        "metrics": {"relevance": {"use_embeddings": True}},
+        "judge": {"mode": "pointwise", **judge},
+        "budget": {"prices": PRICES, "judge_output_tokens": 100, "expected_escalation_rate": 0.5},
+    }
+
+
+def _data(n):
+    ds = {f"q{i}": {"id": f"q{i}", "prompt": f"question {i}", "reference": "an answer"} for i in range(n)}
+    gens = [{"id": f"q{i}", "model": "m", "output": "some output text"} for i in range(n)]
+    return ds, gens
+
+
+def test_estimate_counts_judge_and_embedding_tokens():
+    ds, gens = _data(10)
+    est = estimate_run(_cfg(), ds, gens, RUBRIC)
+    judge_in = sum(count_tokens(build_pointwise_prompt(ds[g["id"]]["prompt"], g["output"], RUBRIC), "judge")
+                   for g in gens)
+    assert est["by_model"]["judge"]["input_tokens"] == judge_in
+    assert est["by_model"]["judge"]["output_tokens"] == 10 * 100
+    assert est["by_model"]["judge"]["calls"] == 10
+    assert est["by_model"]["embed"]["calls"] == 11  # one batch of references, one call per output
+    assert est["cost_usd"] == pytest.approx(sum(m["cost_usd"] for m in est["by_model"].values()))
+    assert est["unpriced_models"] == []
+
+
+def test_estimate_scales_a_sample():
+    ds, gens = _data(400)
+    full = estimate_run(_cfg(), ds, gens, RUBRIC)
+    sampled = estimate_run(_cfg(), ds, gens, RUBRIC, sample=100)
+    assert sampled["sampled_rows"] == 100 and sampled["rows"] == 400
+    assert sampled["by_model"]["judge"]["input_tokens"] == pytest.approx(
+        full["by_model"]["judge"]["input_tokens"], rel=0.05)
+
+
+def test_estimate_with_cascade_and_anchors():
+    ds, gens = _data(10)
+    cfg = _cfg(cascade={"enabled": True, "provider": "gorq", "provider_args": {"model": "cheap"}})
+    anchors = [{"prompt": "p", "good": "g", "bad": "b"}]
+    est = estimate_run(cfg, ds, gens, RUBRIC, anchors=anchors)
+    assert est["by_model"]["cheap"]["calls"] == 10
+    assert est["by_model"]["judge"]["calls"] == 10 * 0.5 + 2  # escalations plus both anchor orders
+    assert est["unpriced_models"] == ["cheap"]
+
+
+def test_priority_order_uncertain_first():
+    strata = ["a", "a", "b", "b"]
+    lexical = [0.9, 0.5, 0.1, 0.45]
+    order = priority_order(strata, lexical, mode="uncertain")
+    assert order == [1, 3, 0, 2]
+    assert sorted(priority_order(strata)) == [0, 1, 2, 3]
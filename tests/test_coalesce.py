@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from llmeval.providers.coalesce import CoalescingProvider
+from llmeval.utils.profiling import RunMetrics
+
+
+class FakeProvider:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay, self.fail = delay, fail
+        self.judge_calls, self.embed_calls = [], []
+        self.model = "fake"
+
+    def judge(self, prompt, rubric):
+        self.judge_calls.append(prompt)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("down")
+        return {"scores": {"relevance": len(prompt)}}
+
+    def embed(self, texts):
+        self.embed_calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("down")
+        return [[float(len(t))] * 4 for t in texts]
+
+
+def _parallel(fn, n):
+    out = [None] * n
+    def run(i):
+        out[i] = fn()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def test_concurrent_judge_calls_share_one_request():
+    inner, metrics = FakeProvider(delay=0.05), RunMetrics()
+    p = CoalescingProvider(inner, metrics, max_bytes=0)
+    results = _parallel(lambda: p.judge("same prompt", {}), 8)
+    assert len(inner.judge_calls) == 1
+    assert all(r == {"scores": {"relevance": 11}} for r in results)
+    assert metrics.counters["coalesce.judge.saved"] == 7
+    # callers get their own copies
+    results[0]["scores"]["relevance"] = 0
+    assert results[1]["scores"]["relevance"] == 11
+
+
+def test_only_in_flight_calls_are_kept():
+    inner = FakeProvider()
+    p = CoalescingProvider(inner, max_bytes=0)
+    p.judge("a", {})
+    p.judge("a", {})
+    assert len(inner.judge_calls) == 2
+    assert p._inflight == {"judge": {}, "embed": {}}
+    assert p.cache_bytes() == {"judge": 0, "embed": 0}
+
+
+def test_finished_results_lru_is_byte_capped():
+    inner = FakeProvider()
+    p = CoalescingProvider(inner, max_bytes=2 * (8 * 4 + 64))  # room for two vectors
+    p.embed(["a", "b"])
+    p.embed(["c"])  # evicts "a"
+    assert p.cache_bytes()["embed"] <= p.max_bytes
+    p.embed(["b", "c"])
+    assert len(inner.embed_calls) == 2
+    p.embed(["a"])
+    assert inner.embed_calls[-1] == ["a"]
+
+
+def test_embed_dedups_within_and_across_batches():
+    inner, metrics = FakeProvider(), RunMetrics()
+    p = CoalescingProvider(inner, metrics)
+    assert p.embed(["x", "yy", "x"]) == [[1.0] * 4, [2.0] * 4, [1.0] * 4]
+    assert inner.embed_calls == [["x", "yy"]]
+    p.embed(["yy", "zzz"])
+    assert inner.embed_calls[-1] == ["zzz"]
+    p.embed(["x"])
+    assert len(inner.embed_calls) == 2
+    assert metrics.counters["coalesce.embed.saved_texts"] == 3
+    assert metrics.counters["coalesce.embed.saved_calls"] == 1
+
+
+def test_failures_are_raised_to_waiters_and_not_remembered():
+    inner = FakeProvider(delay=0.05, fail=True)
+    p = CoalescingProvider(inner)
+    errors = []
+    def call():
+        try:
+            p.judge("q", {})
+        except RuntimeError as exc:
+            errors.append(exc)
+    _parallel(call, 4)
+    assert len(errors) == 4 and len(inner.judge_calls) == 1
+    inner.fail = False
+    assert p.judge("q", {})["scores"]
+    with pytest.raises(RuntimeError):
+        inner.fail = True
+        p.embed(["t"])
+    inner.fail = False
+    p.embed(["t"])
+    assert inner.embed_calls == [["t"], ["t"]]
+
+
+def test_passes_other_attributes_through():
+    assert CoalescingProvider(FakeProvider()).model == "fake"
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from llmeval.runners.compare import bh_adjust, compare_runs, join_key, paired_tests
+
+
+def test_paired_tests_detects_shift():
+    d = np.random.default_rng(0).normal(0.5, 1.0, 200)
+    res = paired_tests(d, n_resamples=2000)
+    assert res["method"] == "resample"
+    assert res["mean_delta"] == pytest.approx(d.mean())
+    assert res["ci_low"] < d.mean() < res["ci_high"]
+    assert res["p_value"] < 0.01
+
+
+def test_paired_tests_no_shift():
+    d = np.random.default_rng(1).normal(0.0, 1.0, 200)
+    res = paired_tests(d, n_resamples=2000)
+    assert res["ci_low"] < 0 < res["ci_high"]
+    assert res["p_value"] > 0.05
+
+
+def test_paired_tests_normal_fallback_agrees():
+    d = np.random.default_rng(2).normal(0.2, 1.0, 400)
+    exact = paired_tests(d, n_resamples=4000)
+    approx = paired_tests(d, n_resamples=4000, max_cells=1000)
+    assert approx["method"] == "normal"
+    assert approx["ci_low"] == pytest.approx(exact["ci_low"], abs=0.03)
+    assert approx["ci_high"] == pytest.approx(exact["ci_high"], abs=0.03)
+    assert approx["p_value"] == pytest.approx(exact["p_value"], abs=0.01)
+
+
+def test_paired_tests_degenerate():
+    assert paired_tests(np.array([np.nan]))["n"] == 0
+    zeros = paired_tests(np.zeros(10))
+    assert zeros["method"] == "degenerate" and zeros["p_value"] == 1.0
+
+
+def test_bh_adjust():
+    q = bh_adjust([0.01, None, 0.04, 0.03, 0.5])
+    assert q[1] is None
+    # sorted p: 0.01, 0.03, 0.04, 0.5 -> 0.04, 0.0533, 0.0533, 0.5
+    assert q[0] == pytest.approx(0.04)
+    assert q[3] == pytest.approx(0.04 * 4 / 3)
+    assert q[2] == pytest.approx(0.04 * 4 / 3)
+    assert q[4] == pytest.approx(0.5)
+    assert bh_adjust([None]) == [None]
+
+
+def test_join_key():
+    single = pd.DataFrame({"id": [1, 2], "model": ["m", "m"]})
+    multi = pd.DataFrame({"id": [1, 1, 2, 2], "model": ["m", "n", "m", "n"]})
+    assert join_key([single, single]) == ["id"]
+    assert join_key([multi, multi]) == ["id", "model"]
+    with pytest.raises(ValueError, match="one row per id"):
+        join_key([multi, multi.drop(columns="model")])
+
+
+def test_compare_runs_pairs_by_id():
+    base = pd.DataFrame({"id": ["a", "b", "c"], "relevance": [0.5, 0.6, 0.7], "toxic_hits": [0, 1, 0]})
+    other = pd.DataFrame({"id": ["c", "b", "d"], "relevance": [0.9, 0.8, 0.1], "toxic_hits": [0, 0, 3]})
+    rows, joined = compare_runs(base, other, n_resamples=200)
+    assert len(joined) == 2
+    by_metric = {r["metric"]: r for r in rows}
+    assert by_metric["relevance"]["mean_delta"] == pytest.approx(0.2)
+    assert by_metric["relevance"]["improved"]
+    assert by_metric["toxic_hits"]["improved"]  # lower is better
+    assert all("q_value" in r for r in rows)
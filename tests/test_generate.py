@@ -0,0 +1,47 @@
+import json
+
+from llmeval.runners.generate import completed
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_missing_file(tmp_path):
+    assert completed(str(tmp_path / "none.jsonl")) == set()
+
+
+def test_reads_id_model_pairs(tmp_path):
+    path = tmp_path / "gen.jsonl"
+    _write(path, b'{"id": 1, "model": "a", "output": "x"}\n\n{"id": "2", "model": "b"}\n')
+    assert completed(str(path)) == {("1", "a"), ("2", "b")}
+    assert path.read_bytes().endswith(b'"b"}\n')
+
+
+def test_truncates_cut_off_last_line(tmp_path, capsys):
+    path = tmp_path / "gen.jsonl"
+    good = b'{"id": "1", "model": "a"}\n'
+    _write(path, good + b'{"id": "2", "mod')
+    assert completed(str(path)) == {("1", "a")}
+    assert path.read_bytes() == good
+    assert "Warning" not in capsys.readouterr().out
+
+
+def test_terminates_valid_last_line(tmp_path):
+    path = tmp_path / "gen.jsonl"
+    _write(path, b'{"id": "1", "model": "a"}\n{"id": "2", "model": "a"}')
+    assert completed(str(path)) == {("1", "a"), ("2", "a")}
+    # the next append starts on its own line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "3", "model": "a"}) + "\n")
+    assert completed(str(path)) == {("1", "a"), ("2", "a"), ("3", "a")}
+
+
+def test_keeps_rows_after_a_corrupt_line(tmp_path, capsys):
+    path = tmp_path / "gen.jsonl"
+    data = b'{"id": "1", "model": "a"}\nnot json\n[1, 2]\n{"id": "2", "model": "a"}\n'
+    _write(path, data)
+    assert completed(str(path)) == {("1", "a"), ("2", "a")}
+    assert path.read_bytes() == data  # complete lines are never removed
+    assert "skipped 2 unreadable line(s)" in capsys.readouterr().out
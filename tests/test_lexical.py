@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import pytest
+
+from llmeval.metrics.lexical import LexicalScorer, lcs_length
+from llmeval.utils.common import lexical_f1
+
+WORDS = "the a cat dog sat on mat it is four 4 The CAT".split()
+
+
+def _random_pairs(n, seed=0):
+    rng = random.Random(seed)
+    refs = {f"r{i}": " ".join(rng.choices(WORDS, k=rng.randint(1, 12))) for i in range(20)}
+    keys = [rng.choice(list(refs)) for _ in range(n)]
+    # some outputs use words the references never do
+    outs = [" ".join(rng.choices(WORDS + [f"new{i}"], k=rng.randint(0, 12))) for i in range(n)]
+    return refs, keys, outs
+
+
+def test_f1_matches_lexical_f1():
+    refs, keys, outs = _random_pairs(300)
+    scorer = LexicalScorer()
+    scorer.add_references(refs)
+    got = scorer.score(keys, outs, metrics=["f1"])["f1"]
+    want = [lexical_f1(o, refs[k]) for k, o in zip(keys, outs)]
+    np.testing.assert_allclose(got, want)
+
+
+def test_batches_give_same_scores():
+    refs, keys, outs = _random_pairs(100, seed=1)
+    scorer = LexicalScorer()
+    scorer.add_references(refs)
+    whole = scorer.score(keys, outs)
+    split = scorer.score(keys, outs, batch_size=7)
+    for m in whole:
+        np.testing.assert_allclose(whole[m], split[m])
+
+
+def test_identical_and_disjoint_texts():
+    scorer = LexicalScorer()
+    scorer.add_references({"r": "the cat sat on the mat"})
+    res = scorer.score(["r", "r"], ["the cat sat on the mat", "dogs bark loudly"])
+    for m in ("f1", "rouge1", "rouge2", "rougeL"):
+        assert res[m][0] == pytest.approx(1.0)
+        assert res[m][1] == 0.0
+    assert res["bleu"][0] == pytest.approx(1.0)
+    assert res["bleu"][1] == 0.0
+
+
+def test_short_texts_without_4grams():
+    scorer = LexicalScorer()
+    scorer.add_references({"r": "it is 4"})
+    res = scorer.score(["r"], ["it is 4."])
+    assert 0.0 < res["bleu"][0] < 1.0
+    assert res["f1"][0] == pytest.approx(lexical_f1("it is 4.", "it is 4"))
+
+
+def test_outputs_do_not_grow_vocab():
+    scorer = LexicalScorer()
+    scorer.add_references({"r": "the cat"})
+    size = len(scorer.vocab)
+    scorer.score(["r"] * 3, ["unseen words here", "more new ones", "the cat"])
+    assert len(scorer.vocab) == size
+
+
+def test_missing_reference_scores_zero():
+    scorer = LexicalScorer()
+    res = scorer.score(["nope"], ["some output"])
+    assert all(res[m][0] == 0.0 for m in res)
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        LexicalScorer().score([], [], metrics=["meteor"])
+
+
+def test_lcs_length():
+    assert lcs_length([1, 2, 3, 4], [1, 3, 4, 2]) == 3
+    assert lcs_length([], [1]) == 0
@@ -0,0 +1,88 @@
+import random
+
+from llmeval.judge.longform import MapReduceEngine, split_sections
+from llmeval.utils.budget import count_tokens
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def _document(n_paragraphs, seed=0):
+    rng = random.Random(seed)
+    paras = []
+    for _ in range(n_paragraphs):
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(5, 15))) + "." for _ in range(rng.randint(2, 6))]
+        paras.append(" ".join(sentences))
+    return paras
+
+
+def test_sections_respect_the_size_and_keep_all_text():
+    paras = _document(60)
+    text = "\n\n".join(paras)
+    sections = split_sections(text, 200)
+    assert len(sections) > 1
+    for body, tokens in sections:
+        assert tokens == sum(count_tokens(p) for p in body.split("\n\n"))
+        assert tokens <= 200
+    assert [p for body, _ in sections for p in body.split("\n\n")] == paras
+
+
+def test_long_paragraphs_and_words_are_split():
+    text = "word " * 2000 + "\n\n" + "x" * 5000
+    sections = split_sections(text, 100)
+    assert all(tokens <= 100 for _, tokens in sections)
+    assert "".join(body.replace("\n\n", "").replace(" ", "") for body, _ in sections) == \
+        text.replace("\n\n", "").replace(" ", "")
+
+
+def test_short_and_empty_text():
+    assert split_sections("just one line", 100) == [("just one line", count_tokens("just one line"))]
+    assert split_sections("", 100) == [("", 0)]
+
+
+def test_edit_only_changes_nearby_sections():
+    paras = _document(200, seed=1)
+    before = split_sections("\n\n".join(paras), 300)
+    paras[100] = "An edited paragraph with entirely new words in it."
+    after = split_sections("\n\n".join(paras), 300)
+    old, new = {b for b, _ in before}, {b for b, _ in after}
+    # content-defined cuts: sections away from the edit are unchanged
+    assert len(old - new) <= 3
+    assert len(old & new) >= len(old) - 3
+
+
+class _Judge:
+    def __init__(self):
+        self.prompts = []
+
+    def judge(self, prompt, rubric):
+        self.prompts.append(prompt)
+        return {"scores": {"relevance": 4, "harms": 1 if "BAD" in prompt else 0}, "justification": "ok"}
+
+
+class _Engine:
+    def __init__(self):
+        self.provider = _Judge()
+        self.rubric = {"criteria": [{"key": "relevance", "desc": "On topic?", "scale": [0, 5]},
+                                    {"key": "harms", "desc": "Harmful?", "scale": [0, 1]}]}
+
+    def judge_id(self):
+        return "test"
+
+    def score_pointwise(self, prompt, output, ask_confidence=False):
+        return self.provider.judge(prompt + output, self.rubric)
+
+
+def test_map_reduce_engine_splits_long_answers():
+    engine = _Engine()
+    mr = MapReduceEngine(engine, max_input_tokens=500, chunk_tokens=200, reducers={"harms": "max"})
+    assert "sections" not in mr.score_pointwise("short question", "short answer")
+    paras = _document(80, seed=2)
+    paras[40] += " BAD"
+    res = mr.score_pointwise("question", "\n\n".join(paras))
+    assert res["sections"] > 1
+    assert res["scores"] == {"relevance": 4, "harms": 1}  # weighted mean, and max for harms
+    assert mr.stats()["direct"] == 1 and mr.stats()["split"] == 1
+    # the same answer again is served from the section cache
+    calls = len(engine.provider.prompts)
+    mr.score_pointwise("question", "\n\n".join(paras))
+    assert len(engine.provider.prompts) == calls
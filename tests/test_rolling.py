@@ -0,0 +1,69 @@
+import math
+import random
+
+import pytest
+
+from llmeval.metrics.rolling import GroupedWindows, RollingWindow, breached
+
+
+def test_keeps_last_size_rows():
+    w = RollingWindow(size=3)
+    for i in range(5):
+        w.add({"x": i}, ts=i)
+    assert len(w) == 3
+    assert w.means() == {"x": pytest.approx(3.0)}
+
+
+def test_skips_missing_values_per_key():
+    w = RollingWindow(size=10)
+    w.add({"x": 1.0, "y": None}, ts=0)
+    w.add({"x": math.nan, "y": 4.0}, ts=1)
+    w.add({"x": 3.0, "y": "n/a"}, ts=2)
+    assert w.means() == {"x": pytest.approx(2.0), "y": pytest.approx(4.0)}
+
+
+def test_key_with_no_values_left_is_none():
+    w = RollingWindow(size=1)
+    w.add({"x": 1.0}, ts=0)
+    w.add({"y": 2.0}, ts=1)
+    assert w.means() == {"x": None, "y": pytest.approx(2.0)}
+
+
+def test_time_window_expires_old_rows():
+    w = RollingWindow(size=100, seconds=10)
+    w.add({"x": 1.0}, ts=0)
+    w.add({"x": 3.0}, ts=5)
+    w.add({"x": 5.0}, ts=12)  # drops the row from t=0
+    assert len(w) == 2 and w.means()["x"] == pytest.approx(4.0)
+    w.expire(now=30)
+    assert len(w) == 0 and w.means()["x"] is None
+
+
+def test_incremental_sums_match_recomputation():
+    rng = random.Random(0)
+    w = RollingWindow(size=50)
+    vals = [rng.uniform(-1e6, 1e6) for _ in range(5000)]  # several full recomputations
+    for i, v in enumerate(vals):
+        w.add({"x": v}, ts=i)
+    assert w.means()["x"] == pytest.approx(sum(vals[-50:]) / 50, rel=1e-9)
+
+
+def test_grouped_windows():
+    g = GroupedWindows(size=10, max_groups=2)
+    g.add("a", {"x": 1.0}, ts=0)
+    g.add("b", {"x": 3.0}, ts=1)
+    g.add("a", {"x": 2.0}, ts=2)
+    g.add("c", {"x": 5.0}, ts=3)  # drops "b", the least recently updated
+    snap = g.snapshot()
+    assert snap["n"] == 4 and snap["x"] == pytest.approx(11 / 4)
+    assert set(snap["groups"]) == {"a", "c"}
+    assert snap["groups"]["a"] == {"n": 2, "x": pytest.approx(1.5)}
+
+
+def test_breached():
+    rules = {"rel": {"min": 0.5}, "tox": {"max": 0.1}, "absent": {"min": 1}}
+    assert breached({"rel": 0.6, "tox": 0.05}, rules) == []
+    assert breached({"rel": 0.4, "tox": 0.2, "absent": None}, rules) == [
+        {"metric": "rel", "value": 0.4, "min": 0.5},
+        {"metric": "tox", "value": 0.2, "max": 0.1},
+    ]
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pytest
+
+from llmeval.metrics.sampling import stratified_mean_ci, stratified_order
+
+
+def _data(n_a=300, n_b=100, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.r_[rng.normal(1.0, 1.0, n_a), rng.normal(3.0, 1.0, n_b)]
+    strata = np.array(["a"] * n_a + ["b"] * n_b, dtype=object)
+    return values, strata
+
+
+def test_mean_is_population_weighted():
+    values, strata = _data()
+    # the sample over-represents b: weights come from the population sizes
+    res = stratified_mean_ci(values, strata, {"a": 900, "b": 100})
+    want = 0.9 * values[strata == "a"].mean() + 0.1 * values[strata == "b"].mean()
+    assert res["mean"] == pytest.approx(want)
+    assert res["ci_low"] < res["mean"] < res["ci_high"]
+    assert res["width"] == pytest.approx(res["ci_high"] - res["ci_low"])
+    assert res["n"] == 400
+
+
+def test_nan_ignored_and_empty():
+    values, strata = _data()
+    with_nan = np.r_[values, np.nan]
+    res = stratified_mean_ci(with_nan, np.append(strata, "a"), {"a": 900, "b": 100})
+    assert res == stratified_mean_ci(values, strata, {"a": 900, "b": 100})
+    assert stratified_mean_ci(np.array([np.nan]), np.array(["a"], dtype=object), {"a": 1}) is None
+
+
+def test_single_value_has_no_interval():
+    res = stratified_mean_ci(np.array([2.0]), np.array(["a"], dtype=object), {"a": 10})
+    assert res["mean"] == 2.0 and res["width"] == math.inf
+
+
+def test_full_population_has_zero_width():
+    values, strata = _data()
+    res = stratified_mean_ci(values, strata, {"a": 300, "b": 100})
+    assert res["width"] == pytest.approx(0.0)
+
+
+def test_bootstrap_agrees_with_analytic():
+    values, strata = _data()
+    pops = {"a": 30_000, "b": 10_000}
+    analytic = stratified_mean_ci(values, strata, pops)
+    boot = stratified_mean_ci(values, strata, pops, method="bootstrap", n_boot=2000)
+    assert boot["mean"] == pytest.approx(analytic["mean"])
+    assert boot["width"] == pytest.approx(analytic["width"], rel=0.15)
+
+
+def test_bootstrap_chunks_and_falls_back():
+    values, strata = _data()
+    pops = {"a": 30_000, "b": 10_000}
+    whole = stratified_mean_ci(values, strata, pops, method="bootstrap", n_boot=500)
+    chunked = stratified_mean_ci(values, strata, pops, method="bootstrap", n_boot=500, max_cells=200_000)
+    assert chunked["width"] == pytest.approx(whole["width"], rel=0.2)
+    # above max_cells the normal approximation is used
+    capped = stratified_mean_ci(values, strata, pops, method="bootstrap", n_boot=500, max_cells=1000)
+    assert capped == stratified_mean_ci(values, strata, pops)
+
+
+def test_stratified_order_prefixes_are_proportional():
+    strata = ["a"] * 300 + ["b"] * 100
+    order = stratified_order(strata, seed=3)
+    assert sorted(order) == list(range(400))
+    for k in (40, 100, 200):
+        share_b = sum(strata[i] == "b" for i in order[:k]) / k
+        assert abs(share_b - 0.25) <= 2 / k + 0.01
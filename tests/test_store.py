@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+from llmeval.utils.store import JsonlStore, ingest_jsonl
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    rows = [{"id": f"q{i}", "model": "m" if i % 2 else None, "text": "x" * (i * 7 % 23)} for i in range(40)]
+    rows.append({"id": "q3", "model": "dup", "text": "second"})  # first record wins on lookup
+    path = tmp_path / "data.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, r in enumerate(rows):
+            f.write(json.dumps(r) + "\n")
+            if i % 9 == 0:
+                f.write("\n")
+    return str(path), rows
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 17, 64, 1000, 1 << 20])
+def test_chunked_ingest_keeps_every_line_once(tmp_path, jsonl, chunk_bytes):
+    src, rows = jsonl
+    db = str(tmp_path / "out.sqlite")
+    assert ingest_jsonl(src, db, workers=1, chunk_bytes=chunk_bytes) == len(rows)
+    store = JsonlStore(db)
+    assert list(store) == rows
+    store.close()
+
+
+def test_parallel_ingest_matches_serial(tmp_path, jsonl):
+    src, rows = jsonl
+    db = str(tmp_path / "out.sqlite")
+    assert ingest_jsonl(src, db, workers=2, chunk_bytes=100) == len(rows)
+    store = JsonlStore(db)
+    assert list(store) == rows
+    store.close()
+
+
+def test_lookups(tmp_path, jsonl):
+    src, rows = jsonl
+    store = JsonlStore.for_source(src, cache_dir=str(tmp_path / "cache"))
+    assert len(store) == len(rows)
+    assert "q5" in store and "nope" not in store
+    assert store.get("q3")["text"] == rows[3]["text"]
+    assert store.get("nope", {}) == {}
+    got = store.get_many(["q1", "q3", "nope", "q1"])
+    assert set(got) == {"q1", "q3"} and got["q3"] == rows[3]
+    assert len(store.ids()) == len(rows) - 1
+    store.close()
+
+
+def test_for_source_rebuilds_when_file_changes(tmp_path, jsonl):
+    src, rows = jsonl
+    cache = str(tmp_path / "cache")
+    store = JsonlStore.for_source(src, cache_dir=cache)
+    assert JsonlStore.is_fresh(store.db_path, src)
+    store.close()
+    with open(src, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "new"}) + "\n")
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert not JsonlStore.is_fresh(store.db_path, src)
+    store = JsonlStore.for_source(src, cache_dir=cache)
+    assert "new" in store and len(store) == len(rows) + 1
+    store.close()